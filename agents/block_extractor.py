@@ -1,22 +1,86 @@
 import fitz
 import pdfplumber
+import hashlib
+import io
+import mmap
 import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from agents.spatial_index import GridIndex, overlap_ratio
+from agents.metrics import get_default_metrics
+
+IMAGE_DIR = "processed_output/images"
+
+# Process-pool extraction (workers=1 keeps everything in-process)
+EXTRACT_WORKERS = 1
+EXTRACT_CHUNK_SIZE = 25     # pages per worker task
+# No fork of a multi-threaded parent (see pdf_rebuilder.WORKER_CONTEXT)
+WORKER_CONTEXT = multiprocessing.get_context("forkserver")
+
+# Fraction of a text line that must lie inside a table for the line to be
+# dropped (the table cells carry that text). 1.0 = full containment only.
+TABLE_OVERLAP_THRESHOLD = 1.0
+
+
+def is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+def open_fitz(source):
+    # Path → PyMuPDF reads the file lazily; bytes / mmap → zero-copy view
+    if is_path(source):
+        return fitz.open(source)
+    return fitz.open(stream=memoryview(source), filetype="pdf")
+
+
+def open_plumber(source):
+    if is_path(source):
+        return pdfplumber.open(source)
+    if isinstance(source, mmap.mmap):
+        # mmap is file-like itself: pdfminer seeks/reads it without a copy
+        source.seek(0)
+        return pdfplumber.open(source)
+    return pdfplumber.open(io.BytesIO(source))
+
+
+def _extract_page_range(pdf_path, first, last, table_overlap=TABLE_OVERLAP_THRESHOLD,
+                        images_in_memory=False):
+    # Runs in a worker process: single-pass extraction of pages first..last
+    extractor = PDFBlockExtractor(pdf_path, table_overlap=table_overlap,
+                                  images_in_memory=images_in_memory)
+    extractor._extract_pages(first, last)
+    return extractor.blocks, extractor.tables, extractor.images, extractor.page_sizes
 
 
 class PDFBlockExtractor:
 
-    def __init__(self, pdf_path):
+    def __init__(self, pdf_path, workers=EXTRACT_WORKERS, chunk_size=EXTRACT_CHUNK_SIZE,
+                 table_overlap=TABLE_OVERLAP_THRESHOLD, images_in_memory=False,
+                 progress=None):
+        # A file path, or the PDF already in memory (bytes / mmap)
         self.pdf_path = pdf_path
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.table_overlap = table_overlap
+        # True → image bytes travel in the result instead of files on disk
+        self.images_in_memory = images_in_memory
+        self.extracted_images = {}     # xref → extract_image() result
+        self.image_bytes_by_key = {}   # content hash → bytes (shared)
+        self.written_images = set()    # content hashes already on disk
         self.blocks = []
         self.images = []
         self.tables = []
         self.page_sizes = {}
+        # progress(stage, done, total) — e.g. a job's status reporter
+        self.progress = progress
 
     def extract(self):
-        self._extract_text_blocks()
-        self._extract_tables()
-        self._remove_table_text_blocks()   # <--- ADD THIS LINE
-        self._extract_images()
+        # Worker processes reopen the file by path; in-memory sources stay serial
+        if self.workers > 1 and is_path(self.pdf_path):
+            self._extract_pages_parallel()
+        else:
+            self._extract_pages()
 
         return {
             "blocks": self.blocks,
@@ -25,99 +89,192 @@ class PDFBlockExtractor:
             "page_sizes": self.page_sizes
         }
 
-    def _remove_table_text_blocks(self):
+    def _remove_table_text_blocks(self, blocks, tables):
+        # Tables are bucketed by page and grid-indexed, so each block is
+        # only compared with the tables that are actually near it.
+        indexes = {}
+        for tbl in tables:
+            if tbl["page"] not in indexes:
+                indexes[tbl["page"]] = GridIndex()
+            indexes[tbl["page"]].insert(tuple(tbl["bbox"]), tbl)
+
         cleaned = []
 
-        for blk in self.blocks:
+        for blk in blocks:
+            index = indexes.get(blk["page"])
+            if index is None:
+                cleaned.append(blk)
+                continue
+
             bx, by, bw, bh = blk["bbox"]
             block_box = (bx, by, bx + bw, by + bh)
 
-            is_inside_table = False
+            # Block is dropped when enough of it lies inside a table
+            # (threshold 1.0 = strict full containment)
+            is_inside_table = any(
+                overlap_ratio(block_box, table_box) >= self.table_overlap
+                for table_box, _ in index.query(block_box)
+            )
 
-            for tbl in self.tables:
-                if tbl["page"] != blk["page"]:
-                    continue
+            if not is_inside_table:
+                cleaned.append(blk)
 
-                tx0, ty0, tx1, ty1 = tbl["bbox"]
-                table_box = (tx0, ty0, tx1, ty1)
+        return cleaned
 
-                # Check if block is inside table box
-                if (block_box[0] >= table_box[0] and
-                    block_box[2] <= table_box[2] and
-                    block_box[1] >= table_box[1] and
-                    block_box[3] <= table_box[3]):
-                    is_inside_table = True
-                    break
+    # ------------------------------
+    # SINGLE PASS: every page is opened once and yields
+    # its lines, tables and images in one traversal
+    # ------------------------------
+    def iter_pages(self, first=1, last=None):
+        # Streaming form: one dict per page, nothing kept on self
+        if not self.images_in_memory:
+            os.makedirs(IMAGE_DIR, exist_ok=True)
+
+        doc = open_fitz(self.pdf_path)
+        try:
+            with open_plumber(self.pdf_path) as pdf:
+                pages = pdf.pages[first - 1:last]
+                for pnum, page in enumerate(pages, start=first):
+                    result = self._extract_page(pnum, page, doc)
+                    if self.progress:
+                        self.progress("extract", pnum - first + 1, len(pages))
+                    yield result
+        finally:
+            doc.close()
+
+    def _extract_page(self, pnum, page, doc):
+        metrics = get_default_metrics()
+        with metrics.span("extract_text"):
+            blocks = self._extract_page_text(pnum, page)
+        with metrics.span("extract_tables"):
+            tables = self._extract_page_tables(pnum, page)
+        with metrics.span("extract_images"):
+            images = self._extract_page_images(pnum, doc[pnum - 1], doc)
+
+        result = {
+            "page": pnum,
+            "page_size": (page.width, page.height),
+            "blocks": self._remove_table_text_blocks(blocks, tables),
+            "tables": tables,
+            "images": images,
+        }
 
-            if not is_inside_table:
-                cleaned.append(blk)
+        # Drop this page's parsed objects before the next one
+        page.close()
+        return result
 
-        self.blocks = cleaned
+    def _extract_pages(self, first=1, last=None):
+        for page in self.iter_pages(first, last):
+            self.page_sizes[page["page"]] = page["page_size"]
+            self.blocks.extend(page["blocks"])
+            self.tables.extend(page["tables"])
+            self.images.extend(page["images"])
+
+    # ------------------------------
+    # PARALLEL: page ranges across a process pool
+    # ------------------------------
+    def _extract_pages_parallel(self):
+        with fitz.open(self.pdf_path) as doc:
+            page_count = doc.page_count
+
+        if page_count <= self.chunk_size:
+            self._extract_pages()
+            return
+
+        ranges = [
+            (first, min(first + self.chunk_size - 1, page_count))
+            for first in range(1, page_count + 1, self.chunk_size)
+        ]
+
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                mp_context=WORKER_CONTEXT) as pool:
+            futures = [
+                pool.submit(_extract_page_range, self.pdf_path, first, last,
+                            self.table_overlap, self.images_in_memory)
+                for first, last in ranges
+            ]
+
+            # Merge strictly in range order → identical to the serial result
+            for fut in futures:
+                blocks, tables, images, page_sizes = fut.result()
+                self.blocks.extend(blocks)
+                self.tables.extend(tables)
+                self.images.extend(images)
+                self.page_sizes.update(page_sizes)
+                if self.progress:
+                    self.progress("extract", len(self.page_sizes), page_count)
 
     # ------------------------------
     # TEXT BLOCKS
     # ------------------------------
-    def _extract_text_blocks(self):
-        with pdfplumber.open(self.pdf_path) as pdf:
-            for pnum, page in enumerate(pdf.pages, start=1):
-                self.page_sizes[pnum] = (page.width, page.height)
+    def _extract_page_text(self, pnum, page):
+        blocks = []
 
-                # Get real text lines with proper bounding boxes
-                lines = page.extract_text_lines()
+        # Get real text lines with proper bounding boxes
+        lines = page.extract_text_lines()
 
-                if not lines:
-                    continue
+        if not lines:
+            return blocks
+
+        for line in lines:
+            text = line.get("text", "").strip()
+            if not text:
+                continue
 
-                for line in lines:
-                    text = line.get("text", "").strip()
-                    if not text:
-                        continue
+            x0 = line["x0"]
+            y0 = line["top"]
+            x1 = line["x1"]
+            y1 = line["bottom"]
 
-                    x0 = line["x0"]
-                    y0 = line["top"]
-                    x1 = line["x1"]
-                    y1 = line["bottom"]
+            blocks.append({
+                "page": pnum,
+                "bbox": [x0, y0, x1 - x0, y1 - y0],
+                "text": text
+            })
+
+        return blocks
 
-                    self.blocks.append({
-                        "page": pnum,
-                        "bbox": [x0, y0, x1 - x0, y1 - y0],
-                        "text": text
-                    })
     # ------------------------------
     # TABLES
     # ------------------------------
-    def _extract_tables(self):
-        with pdfplumber.open(self.pdf_path) as pdf:
-            for pnum, page in enumerate(pdf.pages, start=1):
-                tables = page.find_tables()
+    def _extract_page_tables(self, pnum, page):
+        found = []
+        tables = page.find_tables()
 
-                for tbl in tables:
-                    bbox = tbl.bbox
+        for tbl in tables:
+            bbox = tbl.bbox
 
-                    col_edges = set()
+            col_edges = set()
 
-                    # Extract all x0/x1 edges
-                    for cell in tbl.cells:
-                        try:
-                            x0, x1 = self.get_x0_x1(cell)
-                            col_edges.add(x0)
-                            col_edges.add(x1)
-                        except Exception as e:
-                            print("Skipping cell:", e)
-                            continue
+            # Extract all x0/x1 edges
+            for cell in tbl.cells:
+                try:
+                    x0, x1 = self.get_x0_x1(cell)
+                    col_edges.add(x0)
+                    col_edges.add(x1)
+                except Exception as e:
+                    print("Skipping cell:", e)
+                    continue
 
-                    col_edges = sorted(col_edges)
+            col_edges = sorted(col_edges)
 
-                    col_widths = []
-                    for i in range(len(col_edges) - 1):
-                        col_widths.append(col_edges[i+1] - col_edges[i])
+            col_widths = []
+            for i in range(len(col_edges) - 1):
+                col_widths.append(col_edges[i+1] - col_edges[i])
 
-                    self.tables.append({
-                        "page": pnum,
-                        "bbox": bbox,
-                        "data": tbl.extract(),
-                        "col_widths": col_widths,
-                    })
+            # Cell boxes aligned with "data" (None for merged cells),
+            # used by the overlay rebuilder to write text in place
+            cells = [list(row.cells) for row in tbl.rows]
+
+            found.append({
+                "page": pnum,
+                "bbox": bbox,
+                "data": tbl.extract(),
+                "col_widths": col_widths,
+                "cells": cells,
+            })
+
+        return found
 
     def get_x0_x1(self, cell):
         # Case 1: cell is a dict
@@ -146,62 +303,140 @@ class PDFBlockExtractor:
     # ------------------------------
     # IMAGES
     # ------------------------------
-    def _extract_images(self):
-        import fitz
-        pdf = fitz.open(self.pdf_path)
+    def _extract_page_images(self, page_index, page, pdf):
+        images = []
 
-        os.makedirs("processed_output/images", exist_ok=True)
+        try:
+            image_list = page.get_images(full=True)
+        except Exception as e:
+            print(f"Error reading images on page {page_index}: {e}")
+            return images
 
-        for page_index, page in enumerate(pdf, start=1):
+        placements = self._image_placements(page_index, page)
+        seen = set()
 
+        for img_data in image_list:
+
+            raw_xref = img_data[0]
+
+            # FIX 1 → Correct xref type
             try:
-                image_list = page.get_images(full=True)
-            except Exception as e:
-                print(f"Error reading images on page {page_index}: {e}")
+                xref = int(raw_xref) if isinstance(raw_xref, (bytes, bytearray)) else raw_xref
+            except:
+                print("Skipping image because xref cannot convert:", raw_xref)
                 continue
 
-            for img_data in image_list:
-
-                raw_xref = img_data[0]
+            # get_images can list an xref twice (several resource names);
+            # its placements are all covered the first time
+            if xref in seen:
+                continue
+            seen.add(xref)
 
-                # FIX 1 → Correct xref type
-                try:
-                    xref = int(raw_xref) if isinstance(raw_xref, (bytes, bytearray)) else raw_xref
-                except:
-                    print("Skipping image because xref cannot convert:", raw_xref)
-                    continue
+            # Listed in the resources but never painted (e.g. a soft mask)
+            if placements is not None and xref not in placements:
+                continue
 
-                # FIX 2 → Use ONLY extract_image (NEVER Pixmap)
+            # FIX 2 → Use ONLY extract_image (NEVER Pixmap)
+            # Images reused across pages are extracted once per xref
+            extracted = self.extracted_images.get(xref)
+            if extracted is None:
                 try:
                     extracted = pdf.extract_image(xref)
                 except Exception as e:
                     print(f"Skipping image {xref}: extract_image failed → {e}")
                     continue
+                self.extracted_images[xref] = extracted
+
+                # Content hash: logos embedded under several xrefs collapse
+                # into one image as well
+                if extracted and extracted.get("image"):
+                    key = hashlib.sha1(extracted["image"]).hexdigest()[:16]
+                    extracted["key"] = key
+                    if self.images_in_memory:
+                        extracted["image"] = self.image_bytes_by_key.setdefault(
+                            key, extracted["image"])
+
+            if not extracted:
+                print(f"Empty extracted image for xref {xref}")
+                continue
 
-                if not extracted:
-                    print(f"Empty extracted image for xref {xref}")
-                    continue
+            image_bytes = extracted.get("image")
+            if not image_bytes and extracted.get("key") not in self.written_images:
+                print(f"No byte data for xref {xref}")
+                continue
 
-                image_bytes = extracted.get("image")
-                if not image_bytes:
-                    print(f"No byte data for xref {xref}")
-                    continue
+            ext = extracted.get("ext", "png")
+            key = extracted["key"]
 
-                ext = extracted.get("ext", "png")
-                img_name = f"page{page_index}_img{xref}.{ext}"
-                img_path = os.path.join("processed_output/images", img_name)
+            if self.images_in_memory:
+                # Same bytes object for every placement of this image
+                entry = {
+                    "page": page_index,
+                    "xref": xref,
+                    "image_key": key,
+                    "image_bytes": image_bytes,
+                    "ext": ext,
+                }
+                images.extend(self._place(entry, (placements or {}).get(xref)))
+                continue
+
+            # Content-addressed file: written once, shared by every page
+            img_name = f"img_{key}.{ext}"
+            img_path = os.path.join(IMAGE_DIR, img_name)
 
-                # FIX 3 → Reliable write
+            # FIX 3 → Reliable write (atomic, so parallel jobs never
+            # see a half-written file)
+            if key not in self.written_images:
                 try:
-                    with open(img_path, "wb") as f:
-                        f.write(image_bytes)
+                    if not os.path.exists(img_path):
+                        tmp_path = f"{img_path}.{os.getpid()}.tmp"
+                        with open(tmp_path, "wb") as f:
+                            f.write(image_bytes)
+                        os.replace(tmp_path, img_path)
+                        get_default_metrics().incr("bytes_written", len(image_bytes),
+                                                   kind="image")
+                    self.written_images.add(key)
                 except Exception as e:
                     print(f"Error writing {img_path}: {e}")
                     continue
 
-                # You can also extract bbox in a separate step (optional)
-                self.images.append({
-                    "page": page_index,
-                    "image_file": img_path,
-                    "bbox": None
-                })
+            # On disk now: later placements of this xref only need the path
+            extracted["image"] = None
+
+            entry = {
+                "page": page_index,
+                "image_key": key,
+                "image_file": img_path,
+            }
+            images.extend(self._place(entry, (placements or {}).get(xref)))
+
+        return images
+
+    def _image_placements(self, page_index, page):
+        # Every image instance on the page in ONE get_image_info pass,
+        # grouped by xref; an xref drawn twice keeps both bboxes.
+        # Returns None when placements are unknown → default boxes are used
+        placements = {}
+        try:
+            infos = page.get_image_info(xrefs=True)
+        except Exception as e:
+            print(f"Error reading image placements on page {page_index}: {e}")
+            return None
+
+        for info in infos:
+            xref = info.get("xref")
+            if not xref:
+                continue    # inline image, no xref to match
+            x0, y0, x1, y1 = info["bbox"]
+            placements.setdefault(xref, []).append([x0, y0, x1 - x0, y1 - y0])
+
+        return placements
+
+    def _place(self, entry, bboxes):
+        # One image record per placement (bbox None → rebuilder default box)
+        placed = []
+        for bbox in bboxes or [None]:
+            item = dict(entry)
+            item["bbox"] = bbox
+            placed.append(item)
+        return placed
@@ -1,23 +1,46 @@
-from openai import OpenAI
-import os
+import re
+import time
 
-# Load API key
-with open("data/api_key.txt") as f:
-    os.environ["OPENAI_API_KEY"] = f.read().strip()
+from agents.metrics import get_default_metrics
+from agents.rate_limiter import estimate_tokens
+from agents.translation_backends import create_backend
 
-MODEL_NAME = "gpt-4o-mini"
+# Bump whenever the prompts below change, so cached translations produced
+# by an older prompt are not reused.
+PROMPT_VERSION = 2
+
+# Batched mode: many short blocks are packed into one request, each one
+# tagged with an ID so the answer can be mapped back reliably.
+BATCH_CHAR_BUDGET = 4000      # source characters per request (~1000 tokens)
+BATCH_MAX_SEGMENTS = 80       # hard cap on segments per request
+SEGMENT_TAG = re.compile(r"^\[\[(\d+)\]\]\s?(.*)$")
 
 
 class BlockTranslator:
 
-    def __init__(self):
-        self.client = OpenAI()
+    def __init__(self, batch_char_budget=BATCH_CHAR_BUDGET,
+                 batch_max_segments=BATCH_MAX_SEGMENTS, cache=None, scheduler=None,
+                 backend=None):
+        # Backend comes from config/settings.py unless one is passed in
+        self.backend = backend or create_backend(sdk_retries=scheduler is None)
+        self.cache = cache
+        self.scheduler = scheduler
+        self.batch_char_budget = batch_char_budget
+        self.batch_max_segments = batch_max_segments
 
     def translate_block(self, text, target_lang="hi"):
         text = text.strip()
         if not text:
             return ""
 
+        if self.cache is not None:
+            cached = self.cache.get(text, target_lang, self.backend.model, PROMPT_VERSION)
+            if cached is not None:
+                return cached
+
+        return self._translate_uncached(text, target_lang)
+
+    def _translate_uncached(self, text, target_lang):
         # The CRITICAL FIX: preserve newlines explicitly
         prompt = f"""
 You are a precise translation engine.
@@ -32,6 +55,7 @@ Translate the text below into **{target_lang}**.
 - Do NOT reorder lines.
 - Translate **every line** even if small.
 - If a line is empty, return an empty line.
+- Keep placeholders like {{#0}} exactly as they are.
 
 ### TEXT TO TRANSLATE:
 {text}
@@ -40,19 +64,178 @@ Translate the text below into **{target_lang}**.
 (Return translation ONLY, no explanations)
 """
 
-        response = self.client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[{"role": "user", "content": prompt}]
+        response = self._complete(prompt, text)
+
+        translated = response.text.strip()
+
+        if self.cache is not None:
+            self.cache.put(text, translated, target_lang, self.backend.model, PROMPT_VERSION)
+
+        return translated
+
+    def _complete(self, prompt, source):
+        start = time.perf_counter()
+        if self.scheduler is None:
+            response = self.backend.complete(prompt)
+        else:
+            # Devanagari output costs roughly twice the English input in tokens
+            estimated = estimate_tokens(prompt) + 2 * estimate_tokens(source)
+            response = self.scheduler.call(lambda: self.backend.complete(prompt),
+                                           estimated_tokens=estimated)
+
+        # Latency includes scheduler waits and retries: what the pipeline feels
+        metrics = get_default_metrics()
+        model = self.backend.model
+        metrics.observe("api_call_seconds", time.perf_counter() - start, model=model)
+        if response.total_tokens:
+            metrics.observe("api_call_tokens", response.total_tokens, model=model)
+        return response
+
+    # ------------------------------
+    # BATCHED TRANSLATION
+    # ------------------------------
+    def make_batches(self, texts):
+        # Greedy packing of text indices under the char / segment budget.
+        # A single text larger than the budget still gets its own batch.
+        batches = []
+        current = []
+        size = 0
+
+        for idx, text in enumerate(texts):
+            length = len(text)
+            if current and (size + length > self.batch_char_budget or
+                            len(current) >= self.batch_max_segments):
+                batches.append(current)
+                current = []
+                size = 0
+            current.append(idx)
+            size += length
+
+        if current:
+            batches.append(current)
+
+        return batches
+
+    def translate_batch(self, texts, target_lang="hi"):
+        texts = [t.strip() if isinstance(t, str) else "" for t in texts]
+
+        # Only non-empty texts go to the model; empties map to ""
+        wanted = [i for i, t in enumerate(texts) if t]
+        results = ["" for _ in texts]
+
+        # Cached segments never leave the process
+        if self.cache is not None:
+            missing = []
+            for i in wanted:
+                cached = self.cache.get(texts[i], target_lang, self.backend.model, PROMPT_VERSION)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    results[i] = cached
+            wanted = missing
+
+        if not wanted:
+            return results
+
+        if len(wanted) == 1:
+            results[wanted[0]] = self._translate_uncached(texts[wanted[0]], target_lang)
+            return results
+
+        segments = "\n".join(
+            f"[[{i}]] " + texts[i].replace("\n", "\n    ") for i in wanted
         )
 
-        return response.choices[0].message.content.strip()
+        prompt = f"""
+You are a precise translation engine.
+
+Translate every tagged segment below into **{target_lang}**.
+
+### RULES
+- Every segment starts with a tag like [[7]] at the beginning of a line.
+- Keep every tag exactly as given, in the same order.
+- Translate only the text after the tag.
+- Do NOT merge, split, drop or reorder segments.
+- Keep line breaks inside a segment exactly the same.
+- Translate **every segment** even if small.
+- Keep placeholders like {{#0}} exactly as they are.
+
+### SEGMENTS TO TRANSLATE:
+{segments}
+
+### OUTPUT:
+(Return the tagged segments ONLY, no explanations)
+"""
+
+        response = self._complete(prompt, segments)
+
+        parsed = self.parse_batch(response.text, wanted)
+
+        if parsed is None:
+            # Malformed answer → only THIS batch falls back to per-block calls
+            print(f"Batch of {len(wanted)} segments malformed, retrying one by one")
+            for i in wanted:
+                results[i] = self._translate_uncached(texts[i], target_lang)
+            return results
+
+        for i in wanted:
+            results[i] = parsed[i]
+
+        if self.cache is not None:
+            self.cache.put_many([(texts[i], results[i]) for i in wanted],
+                                target_lang, self.backend.model, PROMPT_VERSION)
+
+        return results
+
+    def parse_batch(self, content, expected_ids):
+        if not content:
+            return None
+
+        parsed = {}
+        current = None
+
+        for line in content.strip().split("\n"):
+            match = SEGMENT_TAG.match(line)
+            if match:
+                current = int(match.group(1))
+                if current in parsed:
+                    return None
+                parsed[current] = [match.group(2)]
+            elif current is not None:
+                parsed[current].append(line.strip())
+            elif line.strip():
+                # Text before the first tag means the format was not followed
+                return None
+
+        if set(parsed) != set(expected_ids):
+            return None
+
+        result = {i: "\n".join(lines).strip() for i, lines in parsed.items()}
+
+        # A bare "[[3]]" tag: the segment was dropped, not translated
+        if not all(result.values()):
+            return None
+
+        return result
+
+    def translate_texts(self, texts, target_lang="hi"):
+        translated = ["" for _ in texts]
+
+        for batch in self.make_batches(texts):
+            results = self.translate_batch([texts[i] for i in batch], target_lang)
+            for idx, text in zip(batch, results):
+                translated[idx] = text
+
+        return translated
+
+    def translate_blocks(self, blocks, target_lang="hi", batched=False):
+        if batched:
+            texts = self.translate_texts([b["text"] for b in blocks], target_lang)
+        else:
+            texts = [self.translate_block(b["text"], target_lang) for b in blocks]
 
-    def translate_blocks(self, blocks, target_lang="hi"):
         translated = []
-        
-        for block in blocks:
-            translated_text = self.translate_block(block["text"], target_lang)
 
+        for block, translated_text in zip(blocks, texts):
             # Make a COPY of block so original extraction is preserved
             new_block = block.copy()
 
@@ -64,7 +247,23 @@ Translate the text below into **{target_lang}**.
         return translated
 
 
-    def translate_table(self, table_data, target_lang="hi"):
+    def translate_table(self, table_data, target_lang="hi", batched=False):
+        if batched:
+            # Translate all string cells of the table in as few calls as possible
+            positions = []
+            texts = []
+            for r, row in enumerate(table_data):
+                for c, cell in enumerate(row):
+                    if cell and isinstance(cell, str):
+                        positions.append((r, c))
+                        texts.append(cell)
+
+            translated_rows = [list(row) for row in table_data]
+            for (r, c), text in zip(positions, self.translate_texts(texts, target_lang)):
+                translated_rows[r][c] = text
+
+            return translated_rows
+
         translated_rows = []
 
         for row in table_data:
@@ -78,4 +277,4 @@ Translate the text below into **{target_lang}**.
 
             translated_rows.append(translated_row)
 
-        return translated_rows
\ No newline at end of file
+        return translated_rows
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+
+CHECKPOINT_DIR = os.path.join("data", "checkpoints")
+HASH_CHUNK = 1024 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TranslationCheckpoint:
+    # Per (input hash, target language, pipeline version) directory holding:
+    #   extraction.pkl  — snapshot of the extractor output
+    #   segments.jsonl  — append-only journal {"id": segment id, "text": translation}
+    # A rerun on the same file reuses both and only translates what is missing.
+    # version: everything that changes the journaled text (model, prompt,
+    # merge settings, extraction settings) — a change starts a fresh journal.
+
+    def __init__(self, input_pdf, target_lang="hi", root=CHECKPOINT_DIR, input_hash=None,
+                 version=""):
+        self.input_hash = input_hash or file_sha256(input_pdf)
+        version_hash = hashlib.sha256(version.encode("utf-8")).hexdigest()[:16]
+        self.dir = os.path.join(root, f"{self.input_hash}_{target_lang}_{version_hash}")
+        self.extraction_path = os.path.join(self.dir, "extraction.pkl")
+        self.journal_path = os.path.join(self.dir, "segments.jsonl")
+        self.lock = threading.Lock()
+        os.makedirs(self.dir, exist_ok=True)
+
+    def clear(self):
+        # Called once the output PDF is written: nothing left to resume, and
+        # the extraction snapshot holds every image of the document
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    # ------------------------------
+    # EXTRACTION SNAPSHOT
+    # ------------------------------
+    def load_extraction(self):
+        if not os.path.isfile(self.extraction_path):
+            return None
+        try:
+            with open(self.extraction_path, "rb") as f:
+                return pickle.load(f)
+        except Exception as e:
+            print("Checkpoint extraction unreadable, extracting again:", e)
+            return None
+
+    def save_extraction(self, data):
+        # Written to a temp file first: a crash never leaves half a snapshot
+        tmp = self.extraction_path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.extraction_path)
+
+    # ------------------------------
+    # SEGMENT JOURNAL
+    # ------------------------------
+    def load_segments(self):
+        done = {}
+        if not os.path.isfile(self.journal_path):
+            return done
+
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Last line cut short by a crash mid-write
+                    continue
+                done[entry["id"]] = entry["text"]
+        return done
+
+    def record(self, segment_ids, texts):
+        lines = "".join(
+            json.dumps({"id": sid, "text": text}, ensure_ascii=False) + "\n"
+            for sid, text in zip(segment_ids, texts)
+        )
+        with self.lock:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from config import settings
+
+PROMETHEUS_PREFIX = "doctrans_"
+
+
+def _series(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    inner = ",".join(f'{k}="{str(v)}"' for k, v in labels)
+    return "{" + inner + "}"
+
+
+# ------------------------------
+# SINKS
+# ------------------------------
+class JsonLogSink:
+    # One JSON object per line for every observation (spans, API calls)
+    # and for the end-of-document snapshot
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def emit(self, event):
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+# ------------------------------
+# REGISTRY
+# ------------------------------
+class Metrics:
+    # Counters (cache hits, retries, bytes written, ...) and summaries
+    # (count / sum / max of span durations, API latency, tokens). Every
+    # observation is also handed to the sinks; the aggregate is what the
+    # Prometheus text endpoint renders.
+
+    def __init__(self, sinks=()):
+        self.sinks = list(sinks)
+        self.lock = threading.Lock()
+        self.counters = {}       # (name, labels) → value
+        self.summaries = {}      # (name, labels) → [count, sum, max]
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def incr(self, name, value=1, **labels):
+        key = _series(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _series(name, labels)
+        with self.lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                self.summaries[key] = [1, value, value]
+            else:
+                summary[0] += 1
+                summary[1] += value
+                summary[2] = max(summary[2], value)
+
+        if self.sinks:
+            self._emit({"ts": time.time(), "metric": name, "value": value,
+                        "labels": labels})
+
+    @contextmanager
+    def span(self, stage, **labels):
+        # Times the block as stage_seconds{stage=...}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start,
+                         stage=stage, **labels)
+
+    def _emit(self, event):
+        for sink in self.sinks:
+            try:
+                sink.emit(event)
+            except Exception as e:
+                print("Metrics sink failed:", e)
+
+    # ------------------------------
+    # EXPORT
+    # ------------------------------
+    def snapshot(self):
+        with self.lock:
+            counters = [
+                {"metric": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            summaries = [
+                {"metric": name, "labels": dict(labels),
+                 "count": s[0], "sum": s[1], "max": s[2]}
+                for (name, labels), s in sorted(self.summaries.items())
+            ]
+        return {"counters": counters, "summaries": summaries}
+
+    def emit_snapshot(self, **labels):
+        if self.sinks:
+            self._emit({"ts": time.time(), "metric": "snapshot", "labels": labels,
+                        "value": self.snapshot()})
+
+    def prometheus_text(self):
+        lines = []
+        with self.lock:
+            counters = sorted(self.counters.items())
+            summaries = sorted(self.summaries.items())
+
+        seen = set()
+        for (name, labels), value in counters:
+            full = f"{PROMETHEUS_PREFIX}{name}_total"
+            if full not in seen:
+                lines.append(f"# TYPE {full} counter")
+                seen.add(full)
+            lines.append(f"{full}{_format_labels(labels)} {value}")
+
+        for (name, labels), (count, total, _) in summaries:
+            full = PROMETHEUS_PREFIX + name
+            if full not in seen:
+                lines.append(f"# TYPE {full} summary")
+                seen.add(full)
+            lines.append(f"{full}_count{_format_labels(labels)} {count}")
+            lines.append(f"{full}_sum{_format_labels(labels)} {total}")
+
+        # Largest single observation, as its own gauge family
+        for (name, labels), (_, _, peak) in summaries:
+            full = f"{PROMETHEUS_PREFIX}{name}_max"
+            if full not in seen:
+                lines.append(f"# TYPE {full} gauge")
+                seen.add(full)
+            lines.append(f"{full}{_format_labels(labels)} {peak}")
+
+        return "\n".join(lines) + "\n"
+
+
+# One registry per process, shared by every pipeline run and the Flask app.
+# Worker processes (parallel extract / rebuild) keep their own.
+_default_metrics = None
+_default_lock = threading.Lock()
+
+
+def get_default_metrics():
+    global _default_metrics
+    if _default_metrics is not None:
+        return _default_metrics
+
+    with _default_lock:
+        if _default_metrics is None:
+            sinks = []
+            if settings.METRICS_SINK == "json":
+                sinks.append(JsonLogSink(settings.METRICS_LOG_PATH))
+            _default_metrics = Metrics(sinks)
+        return _default_metrics
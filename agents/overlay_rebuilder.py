@@ -0,0 +1,145 @@
+import os
+import threading
+
+import fitz
+
+from fonts.register_fonts import DEVANAGARI_TTF
+from agents.metrics import get_default_metrics
+
+FONT_ALIAS = "NotoDeva"
+MAX_FONT_SIZE = 12.0
+MIN_FONT_SIZE = 4.0
+
+# Font file bytes + parsed fitz.Font, loaded once per process
+_font_cache = {}
+_font_lock = threading.Lock()
+
+
+def load_font(path):
+    with _font_lock:
+        if path not in _font_cache:
+            with open(path, "rb") as f:
+                buffer = f.read()
+            _font_cache[path] = (buffer, fitz.Font(fontbuffer=buffer))
+        return _font_cache[path]
+
+
+class PDFOverlayRebuilder:
+    # Edits the SOURCE PDF in place: original text spans are redacted and the
+    # translation is written into the same bboxes. Images, backgrounds and
+    # vector graphics are never decoded or re-encoded, they simply stay.
+
+    def __init__(self, source_pdf, font_path=DEVANAGARI_TTF, progress=None):
+        self.source_pdf = source_pdf
+        self.progress = progress
+        self.font_path = font_path
+        self.font_buffer, self.font = load_font(font_path)
+        self.doc = None
+
+    def rebuild(self, output_path, blocks, images, tables):
+        self.begin(output_path)
+
+        pages = {}
+        for blk in blocks:
+            pages.setdefault(blk["page"], ([], []))[0].append(blk)
+        for tbl in tables:
+            pages.setdefault(tbl["page"], ([], []))[1].append(tbl)
+
+        for done, pnum in enumerate(sorted(pages), start=1):
+            page_blocks, page_tables = pages[pnum]
+            self.draw_page(pnum, page_blocks, [], page_tables)
+            if self.progress:
+                self.progress("rebuild", done, len(pages))
+
+        return self.finish()
+
+    # ------------------------------
+    # INCREMENTAL API (same shape as PDFRebuilder)
+    # ------------------------------
+    def begin(self, output_path):
+        self.output_path = output_path
+        self.doc = fitz.open(self.source_pdf)
+
+    def finish(self):
+        # Keep only the glyphs actually used (needs the optional fontTools)
+        try:
+            self.doc.subset_fonts()
+        except Exception as e:
+            print("Font subsetting skipped:", e)
+
+        # garbage=3 drops the redacted content and merges duplicate objects
+        metrics = get_default_metrics()
+        with metrics.span("rebuild_save"):
+            self.doc.save(self.output_path, garbage=3, deflate=True)
+        metrics.incr("bytes_written", os.path.getsize(self.output_path), kind="pdf")
+        self.doc.close()
+        self.doc = None
+        return self.output_path
+
+    def abort(self):
+        if self.doc is not None:
+            self.doc.close()
+            self.doc = None
+
+    def draw_page(self, pnum, blocks, images, tables, page_size=None):
+        with get_default_metrics().span("rebuild_page"):
+            self._draw_page(pnum, blocks, images, tables, page_size)
+
+    def _draw_page(self, pnum, blocks, images, tables, page_size=None):
+        # `images` and `page_size` are accepted for interface parity only:
+        # the source page keeps its own images and geometry.
+        page = self.doc[pnum - 1]
+
+        items = []
+        for blk in blocks:
+            x, y, w, h = blk["bbox"]
+            items.append((fitz.Rect(x, y, x + w, y + h), blk.get("text") or ""))
+
+        for tbl in tables:
+            cells = tbl.get("cells") or []
+            for row, row_cells in zip(tbl["data"], cells):
+                for text, cell in zip(row, row_cells):
+                    if cell is None or not text or not isinstance(text, str):
+                        continue
+                    items.append((fitz.Rect(cell), text))
+
+        if not items:
+            return
+
+        # 1) remove the original text only (no fill, keep images + line art)
+        for rect, _ in items:
+            page.add_redact_annot(rect, fill=False)
+        page.apply_redactions(
+            images=fitz.PDF_REDACT_IMAGE_NONE,
+            graphics=fitz.PDF_REDACT_LINE_ART_NONE,
+        )
+
+        # 2) write the translation into the same boxes. One TextWriter per
+        # page → a single content stream appended, instead of one per line
+        writer = fitz.TextWriter(page.rect)
+        for rect, text in items:
+            self._write(writer, rect, text)
+        writer.write_text(page)
+
+    def _write(self, writer, rect, text):
+        lines = text.split("\n")
+        line_height = rect.height / len(lines)
+
+        for i, line in enumerate(lines):
+            if not line.strip():
+                continue
+
+            size = self._fit_size(line, rect.width, line_height)
+            baseline = rect.y0 + i * line_height + size
+            try:
+                writer.append((rect.x0, baseline), line, font=self.font, fontsize=size)
+            except Exception as e:
+                print("Overlay text insert failed:", e)
+
+    def _fit_size(self, line, width, height):
+        # Largest size that fits the line height and the box width
+        size = min(MAX_FONT_SIZE, max(MIN_FONT_SIZE, height * 0.9))
+        length = self.font.text_length(line, fontsize=size)
+        if length > width > 0:
+            size = max(MIN_FONT_SIZE, size * width / length)
+        return size
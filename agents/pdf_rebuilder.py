@@ -2,52 +2,115 @@ from reportlab.pdfgen import canvas
 from reportlab.platypus import Table, TableStyle
 from reportlab.lib import colors
 from reportlab.lib.utils import ImageReader
+import io
 import os
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+import shutil
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
 from reportlab.pdfbase.pdfdoc import PDFDocument
 PDFDocument.forcePDFEncryption = False
 
+from fonts.register_fonts import (
+    register_indic_fonts,
+    register_fallback_font,
+    get_font_widths,
+)
+from agents.text_fitter import TextFitter
+from agents.metrics import get_default_metrics
 
+REBUILD_WORKERS = 1
+REBUILD_CHUNK_SIZE = 50     # pages per worker task
+# Workers start from a clean forkserver process, never a fork of the Flask
+# app: a fork taken while a job thread holds a lock (metrics, cache)
+# would deadlock the child on that lock
+WORKER_CONTEXT = multiprocessing.get_context("forkserver")
 
 
-class PDFRebuilder:
+def bucket_by_page(items):
+    # One pass over the items → {page: [items in original order]}
+    if isinstance(items, dict):
+        return items
 
-    def __init__(self, page_sizes):
-        self.page_sizes = page_sizes
-        # --- CONFIG: point to a Devanagari-capable TTF in your repo
-        DEVANAGARI_TTF = os.path.join("fonts", "NotoSansDevanagari-Regular.ttf")  # <- put file here
-        FALLBACK_TTF = os.path.join("fonts","NotoSansDevanagari-VariableFont_wdth,wght.ttf")  # optional fallback ttf for general unicode (set if you have one)
+    buckets = {}
+    for item in items:
+        buckets.setdefault(item.get("page"), []).append(item)
+    return buckets
 
 
-        # Register fonts (only if files exist)
-        DEVANAGARI_FONT = None
-        if os.path.isfile(DEVANAGARI_TTF):
-            try:
-                pdfmetrics.registerFont(TTFont("NotoDeva", DEVANAGARI_TTF))
-                DEVANAGARI_FONT = "NotoDeva"
-            except Exception as e:
-                print(f"Exception while registering font : {e}")
-                DEVANAGARI_FONT = None
+def _render_page_range(page_sizes, blocks, images, tables, chunk_path):
+    # Runs in a worker process: draws one page range into its own PDF
+    rebuilder = PDFRebuilder(page_sizes)
+    rebuilder.begin(chunk_path)
+    for pnum in sorted(page_sizes):
+        rebuilder.draw_page(pnum, blocks.get(pnum, []), images.get(pnum, []),
+                            tables.get(pnum, []))
+    rebuilder.finish()
+    return chunk_path
 
-        # register any fallback TrueType if provided
-        if FALLBACK_TTF and os.path.isfile(FALLBACK_TTF):
-            try:
-                pdfmetrics.registerFont(TTFont("FallbackUnicode", FALLBACK_TTF))
-                FALLBACK_FONT = "FallbackUnicode"
-                
-            except Exception:
-                FALLBACK_FONT = "Helvetica"
-        else:
-            FALLBACK_FONT = "Helvetica"
 
-        print(f"DEVANAGARI_FONT : {DEVANAGARI_FONT}")
-        print(f"FALLBACK_FONT : {FALLBACK_FONT}")
+class PDFRebuilder:
 
-        self.font_to_use = DEVANAGARI_FONT or FALLBACK_FONT
+    def __init__(self, page_sizes, workers=REBUILD_WORKERS, chunk_size=REBUILD_CHUNK_SIZE,
+                 progress=None, flush_pages=0):
+        self.page_sizes = page_sizes
+        self.workers = workers
+        self.chunk_size = chunk_size
+        # flush_pages > 0 → the incremental API writes a chunk PDF every N
+        # pages and merges them in finish(), so the canvas never holds
+        # more than N pages
+        self.flush_pages = flush_pages
+        self.chunk_dir = None
+        self.canvas = None
+        # progress(stage, done, total) — e.g. a job's status reporter
+        self.progress = progress
+        # Fonts come from the process-wide registry: each TTF is parsed and
+        # registered once per process, not once per rebuild
+        DEVANAGARI_FONT = register_indic_fonts()
+        FALLBACK_FONT = None if DEVANAGARI_FONT else register_fallback_font()
+
+        self.font_to_use = DEVANAGARI_FONT or FALLBACK_FONT or "Helvetica"
+        self.font_widths = get_font_widths(self.font_to_use)
+        self.fitter = TextFitter(self.font_widths)
 
         print(f"font_to_use : {self.font_to_use}")
 
+    def _image_key(self, img):
+        # Content hash from the extractor, else xref / file path
+        if img.get("image_key"):
+            return img["image_key"]
+        if img.get("image_bytes") is not None:
+            return f"xref{img.get('xref')}"
+        return img["image_file"]
+
+    def _image_reader(self, img):
+        # Only read when the image's form is first drawn; not cached, the
+        # form is what gets reused, so decoded pixels never pile up
+        if img.get("image_bytes") is not None:
+            return ImageReader(io.BytesIO(img["image_bytes"]))
+        return ImageReader(img["image_file"])
+
+    def _draw_image(self, c, img, x, y, w, h):
+        # Every unique image becomes ONE form XObject (a 1x1 unit square),
+        # decoded and embedded once; each placement just scales it.
+        key = self._image_key(img)
+
+        name = self.image_forms.get(key)
+        if name is None:
+            name = f"Img{len(self.image_forms)}"
+            c.beginForm(name, 0, 0, 1, 1)
+            c.drawImage(self._image_reader(img), 0, 0, width=1, height=1, mask="auto")
+            c.endForm()
+            self.image_forms[key] = name
+
+        c.saveState()
+        c.translate(x, y)
+        c.scale(w, h)
+        c.doForm(name)
+        c.restoreState()
+
     def _draw_images(self, c, images, page_num, page_width, page_height):
         from reportlab.lib.utils import ImageReader
 
@@ -64,7 +127,7 @@ class PDFRebuilder:
                 try:
                     x, y, w, h = bbox
                     draw_y = page_height - y - h
-                    c.drawImage(ImageReader(img["image_file"]),
+                    c.drawImage(self._image_reader(img),
                                 x, draw_y, width=w, height=h, mask="auto")
                 except Exception as e:
                     print("Image draw failed with bbox:", e)
@@ -75,7 +138,7 @@ class PDFRebuilder:
             # ---------------------------------------------------------
             try:
                 c.drawImage(
-                    ImageReader(img["image_file"]),
+                    self._image_reader(img),
                     page_width - 150,
                     page_height - 150,
                     width=140,
@@ -86,114 +149,220 @@ class PDFRebuilder:
                 print("Image draw failed without bbox:", e)
 
     def rebuild(self, output_path, blocks, images, tables):
-        from reportlab.lib.utils import ImageReader
-
-        c = canvas.Canvas(output_path)
+        # Inputs may be flat lists or already bucketed {page: [items]};
+        # either way every element is visited exactly once.
+        blocks = bucket_by_page(blocks)
+        images = bucket_by_page(images)
+        tables = bucket_by_page(tables)
 
         max_page = max(self.page_sizes.keys())
 
+        if self.workers > 1 and max_page > self.chunk_size:
+            return self._rebuild_parallel(output_path, blocks, images, tables, max_page)
+
+        self.begin(output_path)
+
         for pnum in range(1, max_page + 1):
-            page_width, page_height = self.page_sizes[pnum]
-            c.setPageSize((page_width, page_height))
-
-            # ---------------- Images ----------------
-            for img in images:
-                if img["page"] != pnum:
-                    continue
-
-                bbox = img.get("bbox")
-
-                # CASE 1 — no bbox (default positioning)
-                if not bbox or len(bbox) != 4:
-                    try:
-                        c.drawImage(
-                            ImageReader(img["image_file"]),
-                            page_width - 150,
-                            page_height - 150,
-                            width=140,
-                            height=100,
-                            mask="auto",
-                        )
-                    except Exception as e:
-                        print("Image draw failed (no bbox):", e)
-                    continue
-
-                # CASE 2 — draw with real bbox
+            self.draw_page(pnum, blocks.get(pnum, []), images.get(pnum, []),
+                           tables.get(pnum, []))
+            if self.progress:
+                self.progress("rebuild", pnum, max_page)
+
+        return self.finish()
+
+    def _rebuild_parallel(self, output_path, blocks, images, tables, max_page):
+        # Page ranges are rendered to separate PDFs in worker processes,
+        # then appended in order into one document
+        ranges = [
+            (first, min(first + self.chunk_size - 1, max_page))
+            for first in range(1, max_page + 1, self.chunk_size)
+        ]
+
+        def pick(items, first, last):
+            return {p: items[p] for p in range(first, last + 1) if p in items}
+
+        with tempfile.TemporaryDirectory() as tmp, \
+                ProcessPoolExecutor(max_workers=self.workers,
+                                    mp_context=WORKER_CONTEXT) as pool:
+            futures = [
+                pool.submit(
+                    _render_page_range,
+                    {p: self.page_sizes[p] for p in range(first, last + 1)},
+                    pick(blocks, first, last),
+                    pick(images, first, last),
+                    pick(tables, first, last),
+                    os.path.join(tmp, f"chunk_{first:06d}.pdf"),
+                )
+                for first, last in ranges
+            ]
+
+            self._merge_chunks((fut.result() for fut in futures), output_path, max_page)
+
+        return output_path
+
+    def _merge_chunks(self, chunk_paths, output_path, total_pages=None):
+        merged = fitz.open()
+        for path in chunk_paths:
+            with fitz.open(path) as chunk:
+                merged.insert_pdf(chunk)
+            if self.progress and total_pages:
+                self.progress("rebuild", merged.page_count, total_pages)
+
+        # garbage=4 merges identical objects across chunks (images, form
+        # XObjects) so they are stored once. Fonts are NOT shared: each
+        # chunk embeds its own reportlab subset of the Devanagari font
+        # (only the glyphs that chunk used), so the output carries up to
+        # one font file per chunk — about 11 KB each for NotoDeva.
+        metrics = get_default_metrics()
+        with metrics.span("rebuild_save"):
+            merged.save(output_path, garbage=4, deflate=True)
+        merged.close()
+        metrics.incr("bytes_written", os.path.getsize(output_path), kind="pdf")
+
+    # ------------------------------
+    # INCREMENTAL API (streaming pipeline draws page by page)
+    # ------------------------------
+    def begin(self, output_path):
+        self.output_path = output_path
+        self.chunk_dir = tempfile.mkdtemp(prefix="rebuild_") if self.flush_pages else None
+        self.chunk_paths = []
+        self._new_canvas()
+
+    def _new_canvas(self):
+        path = self.output_path
+        if self.chunk_dir:
+            path = os.path.join(self.chunk_dir, f"chunk_{len(self.chunk_paths):06d}.pdf")
+            self.chunk_paths.append(path)
+        self.canvas = canvas.Canvas(path)
+        self.image_forms = {}
+        self.canvas_pages = 0
+
+    def finish(self):
+        if not self.chunk_dir:
+            metrics = get_default_metrics()
+            with metrics.span("rebuild_save"):
+                self.canvas.save()
+            self.canvas = None
+            metrics.incr("bytes_written", os.path.getsize(self.output_path), kind="pdf")
+            return self.output_path
+
+        try:
+            # A canvas opened right after a flush has no pages: not saved
+            if self.canvas_pages or len(self.chunk_paths) == 1:
+                self.canvas.save()
+            else:
+                self.chunk_paths.pop()
+            self.canvas = None
+            self._merge_chunks(self.chunk_paths, self.output_path)
+        finally:
+            self.abort()
+        return self.output_path
+
+    def abort(self):
+        # Drops the chunk files of an unfinished (or merged) document
+        self.canvas = None
+        if self.chunk_dir:
+            shutil.rmtree(self.chunk_dir, ignore_errors=True)
+            self.chunk_dir = None
+
+    def draw_page(self, pnum, blocks, images, tables, page_size=None):
+        with get_default_metrics().span("rebuild_page"):
+            self._draw_page(pnum, blocks, images, tables, page_size)
+
+        self.canvas_pages += 1
+        if self.chunk_dir and self.canvas_pages >= self.flush_pages:
+            with get_default_metrics().span("rebuild_flush"):
+                self.canvas.save()
+            self._new_canvas()
+
+    def _draw_page(self, pnum, blocks, images, tables, page_size=None):
+        # blocks / images / tables hold the items of THIS page only
+        c = self.canvas
+
+        if page_size is not None:
+            self.page_sizes[pnum] = page_size
+
+        page_width, page_height = self.page_sizes[pnum]
+        c.setPageSize((page_width, page_height))
+
+        # ---------------- Images ----------------
+        for img in images:
+            bbox = img.get("bbox")
+
+            # CASE 1 — no bbox (default positioning)
+            if not bbox or len(bbox) != 4:
                 try:
-                    x, y, w, h = bbox
-                    ry = page_height - y - h
-                    c.drawImage(
-                        ImageReader(img["image_file"]),
-                        x,
-                        ry,
-                        width=w,
-                        height=h,
-                        mask="auto",
-                    )
+                    self._draw_image(c, img, page_width - 150, page_height - 150, 140, 100)
                 except Exception as e:
-                    print("Image draw failed with bbox:", e)
+                    print("Image draw failed (no bbox):", e)
+                continue
 
-            # ---------------- Tables ----------------
-            for tbl in tables:
-                if tbl.get("page") != pnum:
-                    continue
+            # CASE 2 — draw with real bbox
+            try:
+                x, y, w, h = bbox
+                ry = page_height - y - h
+                self._draw_image(c, img, x, ry, w, h)
+            except Exception as e:
+                print("Image draw failed with bbox:", e)
 
-                bbox = tbl.get("bbox")
-                if not bbox or len(bbox) != 4:
-                    print("Skipping table with invalid bbox:", bbox)
-                    continue
+        # ---------------- Tables ----------------
+        for tbl in tables:
+            bbox = tbl.get("bbox")
+            if not bbox or len(bbox) != 4:
+                print("Skipping table with invalid bbox:", bbox)
+                continue
 
-                x0, y0, x1, y1 = bbox
-                w = x1 - x0
-                h = y1 - y0
-                ry = page_height - y0 - h
+            x0, y0, x1, y1 = bbox
+            w = x1 - x0
+            h = y1 - y0
+            ry = page_height - y0 - h
 
-                col_widths = tbl.get("col_widths")
+            col_widths = tbl.get("col_widths")
 
-                try:
-                    if col_widths:
-                        t = Table(tbl["data"], colWidths=col_widths)
-                    else:
-                        t = Table(tbl["data"])
-                        
-                    t.setStyle(
-                        TableStyle(
-                            [
-                                ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-                                ("FONTSIZE", (0, 0), (-1, -1), 8),
-                                ("FONTNAME", (0, 0), (-1, -1), self.font_to_use)
-                            ]
-                        )
+            try:
+                if col_widths:
+                    t = Table(tbl["data"], colWidths=col_widths)
+                else:
+                    t = Table(tbl["data"])
+                    
+                t.setStyle(
+                    TableStyle(
+                        [
+                            ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+                            ("FONTSIZE", (0, 0), (-1, -1), 8),
+                            ("FONTNAME", (0, 0), (-1, -1), self.font_to_use)
+                        ]
                     )
-                    t.wrapOn(c, w, h)
-                    t.drawOn(c, x0, ry)
-                except Exception as e:
-                    print("Table draw failed:", e)
+                )
+                t.wrapOn(c, w, h)
+                t.drawOn(c, x0, ry)
+            except Exception as e:
+                print("Table draw failed:", e)
+
+        # ---------------- Text blocks ----------------
+        for blk in blocks:
+            bbox = blk.get("bbox")
+            if not bbox or len(bbox) != 4:
+                print("Skipping text block with invalid bbox:", bbox)
+                continue
 
-            # ---------------- Text blocks ----------------
-            for blk in blocks:
-                if blk.get("page") != pnum:
-                    continue
+            x, y, w, h = bbox
 
-                bbox = blk.get("bbox")
-                if not bbox or len(bbox) != 4:
-                    print("Skipping text block with invalid bbox:", bbox)
-                    continue
+            # Largest size + wrapping that fits the original box
+            size, lines = self.fitter.fit(blk["text"], w, h)
+            ry = page_height - y - size * 0.85
+            step = size * self.fitter.leading
 
-                x, y, w, h = bbox
-                ry = page_height - y - h
+            c.setFont(self.font_to_use, size)
+            for line in lines:
+                try:
+                    c.drawString(x, ry, line)
+                except:
+                    safe = line.encode("utf-8", "replace").decode("utf-8")
+                    c.drawString(x, ry, safe)
+                ry -= step
 
-                c.setFont(self.font_to_use, 9)
-                for line in blk["text"].split("\n"):
-                    try:
-                        c.drawString(x, ry, line)
-                    except:
-                        safe = line.encode("utf-8", "replace").decode("utf-8")
-                        c.drawString(x, ry, safe)
-                    ry -= 12
 
+        c.showPage()
 
-            c.showPage()
 
-        c.save()
-        return output_path
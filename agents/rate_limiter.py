@@ -0,0 +1,284 @@
+import email.utils
+import random
+import threading
+import time
+
+from agents.metrics import get_default_metrics
+
+# Defaults match a low OpenAI usage tier for gpt-4o-mini; raise them if
+# the account has a bigger quota.
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 200_000
+
+MAX_RETRIES = 6
+BASE_DELAY = 1.0          # seconds, first backoff step
+MAX_DELAY = 60.0          # seconds, cap for a single backoff
+
+BREAKER_THRESHOLD = 5     # consecutive non-429 failures before the breaker opens
+BREAKER_COOLDOWN = 30.0   # seconds the breaker stays open
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def estimate_tokens(text):
+    # Rough OpenAI rule of thumb: ~4 characters per token
+    return len(text) // 4 + 1
+
+
+class TokenBucket:
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        # Blocks until `amount` units are available; returns seconds waited
+        amount = min(amount, self.capacity)
+        waited = 0.0
+
+        while True:
+            with self.lock:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return waited
+                delay = (amount - self.level) / self.rate
+
+            time.sleep(delay)
+            waited += delay
+
+    def adjust(self, delta):
+        # Correct an estimate once the real cost is known (may go negative)
+        with self.lock:
+            self._refill()
+            self.level = min(self.capacity, self.level - delta)
+
+
+class CircuitBreaker:
+    # Opens after `threshold` consecutive real failures: calls that ran out
+    # of retries, or server / connection errors. A 429 is only paced (by
+    # Retry-After and the token buckets), it never opens the breaker.
+    # Once the cooldown is over the breaker is half-open: ONE probe call
+    # goes through, the other callers wait for its outcome.
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.is_open = False
+        self.open_until = 0.0     # also used for a shared Retry-After pause
+        self.probe = None         # thread ident of the half-open probe
+        self.cond = threading.Condition()
+
+    def wait_until_closed(self):
+        # While open, callers pause instead of hammering a failing provider
+        me = threading.get_ident()
+        with self.cond:
+            while True:
+                remaining = self.open_until - time.monotonic()
+                if remaining > 0:
+                    self.cond.wait(remaining)
+                    continue
+                if not self.is_open or self.probe == me:
+                    return
+                if self.probe is None:
+                    self.probe = me
+                    print("Circuit breaker half-open, sending one probe call")
+                    return
+                self.cond.wait()
+
+    def record_success(self):
+        with self.cond:
+            self.failures = 0
+            if self.is_open:
+                self.is_open = False
+                self.probe = None
+                self.cond.notify_all()
+
+    def record_failure(self):
+        with self.cond:
+            if self.is_open:
+                # Probe failed → open again for a full cooldown. Calls that
+                # were already in flight when it opened change nothing.
+                if self.probe == threading.get_ident():
+                    self._open()
+                return
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self._open()
+
+    def pause(self, seconds):
+        # Retry-After applies to every caller, not just this one
+        with self.cond:
+            self.open_until = max(self.open_until, time.monotonic() + seconds)
+
+    def release(self):
+        # The probe ended without a verdict (non-retryable error): let
+        # another waiting caller probe instead
+        with self.cond:
+            if self.probe == threading.get_ident():
+                self.probe = None
+                self.cond.notify_all()
+
+    def _open(self):
+        self.is_open = True
+        self.failures = 0
+        self.probe = None
+        self.open_until = max(self.open_until, time.monotonic() + self.cooldown)
+        self.cond.notify_all()
+        print(f"Circuit breaker open for {self.open_until - time.monotonic():.1f}s")
+
+
+def is_retryable(exc):
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+
+    if isinstance(exc, (ConnectionError, TimeoutError)):
+        return True
+
+    # openai.APIConnectionError / APITimeoutError carry no status code
+    return type(exc).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after(exc):
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000.0
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    # HTTP-date form
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler:
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE,
+                 tokens_per_minute=TOKENS_PER_MINUTE, max_retries=MAX_RETRIES,
+                 base_delay=BASE_DELAY, max_delay=MAX_DELAY, breaker=None):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.throttle_wait = 0.0
+
+    def backoff(self, attempt):
+        # Full jitter: uniform(0, min(cap, base * 2^attempt))
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, fn, estimated_tokens=1):
+        attempt = 0
+
+        while True:
+            self.breaker.wait_until_closed()
+
+            waited = self.requests.acquire(1)
+            waited += self.tokens.acquire(estimated_tokens)
+
+            with self.lock:
+                self.calls += 1
+                self.throttle_wait += waited
+            if waited:
+                get_default_metrics().observe("api_throttle_wait_seconds", waited)
+
+            try:
+                result = fn()
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.release()
+                    raise
+                if attempt >= self.max_retries:
+                    self.breaker.record_failure()
+                    raise
+
+                throttled = getattr(e, "status_code", None) == 429
+                pause = retry_after(e)
+                delay = pause if pause is not None else self.backoff(attempt)
+
+                with self.lock:
+                    self.retries += 1
+                    if throttled:
+                        self.throttled += 1
+
+                metrics = get_default_metrics()
+                metrics.incr("api_retries")
+                if throttled:
+                    metrics.incr("api_throttled")
+
+                # Quota pressure is paced, not counted: only server and
+                # connection errors bring the breaker closer to opening
+                if not throttled:
+                    self.breaker.record_failure()
+                if pause:
+                    self.breaker.pause(pause)
+                print(f"Retryable API error ({e.__class__.__name__}), "
+                      f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self.breaker.record_success()
+
+            actual = getattr(result, "total_tokens", None)
+            if actual:
+                self.tokens.adjust(actual - estimated_tokens)
+
+            return result
+
+    def stats(self):
+        with self.lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "throttle_wait_s": round(self.throttle_wait, 3),
+            }
+
+
+# Provider quotas are per API key, so every translator in the process
+# (including concurrent Flask jobs) shares one scheduler.
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_default_scheduler():
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = RequestScheduler()
+        return _default_scheduler
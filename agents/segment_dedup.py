@@ -0,0 +1,96 @@
+import re
+
+from agents.translation_cache import normalize_text
+
+DIGITS = re.compile(r"\d+")
+PLACEHOLDER = re.compile(r"\{#(\d+)\}")
+
+
+def mask_digits(text):
+    # "Page 3 of 10" → ("Page {#0} of {#1}", ["3", "10"])
+    numbers = []
+
+    def _swap(match):
+        numbers.append(match.group(0))
+        return "{#%d}" % (len(numbers) - 1)
+
+    return DIGITS.sub(_swap, text), numbers
+
+
+def unmask_digits(translated, numbers):
+    # Every placeholder must survive translation exactly once,
+    # otherwise the template cannot be trusted for this segment.
+    found = PLACEHOLDER.findall(translated)
+    if sorted(int(i) for i in found) != list(range(len(numbers))):
+        return None
+
+    return PLACEHOLDER.sub(lambda m: numbers[int(m.group(1))], translated)
+
+
+def is_segment(text):
+    # Blank / non-string entries are passed through, never translated
+    return bool(text) and isinstance(text, str) and bool(text.strip())
+
+
+class SegmentDeduplicator:
+
+    def __init__(self, mask_numbers=False):
+        self.mask_numbers = mask_numbers
+        self.unique = []          # texts that actually get translated
+        self.slots = []           # per input: (unique index, numbers) or None
+        self.segments = 0
+
+    def collapse(self, texts):
+        index = {}
+
+        for text in texts:
+            if not is_segment(text):
+                self.slots.append(None)
+                continue
+
+            self.segments += 1
+            key = normalize_text(text)
+            numbers = []
+            if self.mask_numbers:
+                key, numbers = mask_digits(key)
+
+            if key not in index:
+                index[key] = len(self.unique)
+                self.unique.append(key)
+
+            self.slots.append((index[key], numbers))
+
+        return self.unique
+
+    def expand(self, translated_unique):
+        # Fan translations back out; returns the results plus the input
+        # indices whose masked template lost a placeholder.
+        results = []
+        failed = []
+
+        for idx, slot in enumerate(self.slots):
+            if slot is None:
+                results.append("")
+                continue
+
+            uidx, numbers = slot
+            text = translated_unique[uidx]
+
+            if numbers:
+                text = unmask_digits(text, numbers)
+                if text is None:
+                    failed.append(idx)
+                    text = ""
+
+            results.append(text)
+
+        return results, failed
+
+    def stats(self):
+        unique = len(self.unique)
+        return {
+            "segments": self.segments,
+            "unique": unique,
+            "segments_saved": self.segments - unique,
+            "dedup_ratio": (1 - unique / self.segments) if self.segments else 0.0,
+        }
@@ -0,0 +1,134 @@
+from agents.rate_limiter import estimate_tokens
+
+MERGE_TOKEN_BUDGET = 250   # max estimated tokens per merged segment
+ALIGN_TOLERANCE = 4.0      # points of x0 drift still counted as the same column
+LINE_GAP_FACTOR = 0.8      # max vertical gap between lines, × line height
+HEIGHT_TOLERANCE = 0.25    # max relative line-height change (font size change)
+FULL_LINE_RATIO = 0.75     # a line shorter than this × the widest ends a paragraph
+MIN_LINE_WORDS = 4         # short label lines ("Name", "Total:") are never merged
+
+
+class SegmentMerger:
+    # Pre-translation stage: consecutive text lines of the same paragraph
+    # (same page, aligned x0, tight line spacing, similar height) become one
+    # translation segment, so sentences are not cut across calls. After
+    # translation the text is spread back over the original line bboxes.
+
+    def __init__(self, token_budget=MERGE_TOKEN_BUDGET, align_tolerance=ALIGN_TOLERANCE,
+                 line_gap=LINE_GAP_FACTOR):
+        self.token_budget = token_budget
+        self.align_tolerance = align_tolerance
+        self.line_gap = line_gap
+
+    # ------------------------------
+    # GROUPING
+    # ------------------------------
+    def group(self, blocks):
+        # → list of block index lists, ordered by their first line
+        groups = []
+        open_segments = []      # segments on the current page that may still grow
+        page = None
+
+        for idx, blk in enumerate(blocks):
+            if blk["page"] != page:
+                page = blk["page"]
+                open_segments = []
+
+            x, top, w, h = blk["bbox"]
+            tokens = estimate_tokens(blk["text"])
+
+            # Lines come sorted by top: segments whose last line is far
+            # above this one can never grow again
+            open_segments = [
+                seg for seg in open_segments
+                if top - seg["bottom"] <= self.line_gap * seg["height"]
+            ]
+
+            target = None
+            for seg in reversed(open_segments):
+                if self._continues(seg, blk, tokens):
+                    target = seg
+                    break
+
+            if target is None:
+                target = {"lines": [], "tokens": 0, "widest": 0.0}
+                groups.append(target["lines"])
+                open_segments.append(target)
+
+            target["lines"].append(idx)
+            target["tokens"] += tokens
+            target["widest"] = max(target["widest"], w)
+            target["x0"] = x
+            target["bottom"] = top + h
+            target["height"] = h
+            target["last_width"] = w
+            target["last_words"] = len(blk["text"].split())
+
+        return groups
+
+    def _continues(self, seg, blk, tokens):
+        x, top, w, h = blk["bbox"]
+
+        if abs(x - seg["x0"]) > self.align_tolerance:
+            return False
+
+        gap = top - seg["bottom"]
+        if gap < -0.2 * h or gap > self.line_gap * seg["height"]:
+            return False
+
+        if abs(h - seg["height"]) > HEIGHT_TOLERANCE * seg["height"]:
+            return False
+
+        # The previous line must be a "full" paragraph line, not a label
+        # or the short last line of the paragraph before
+        if seg["last_words"] < MIN_LINE_WORDS:
+            return False
+        if seg["last_width"] < FULL_LINE_RATIO * max(seg["widest"], w):
+            return False
+
+        return seg["tokens"] + tokens <= self.token_budget
+
+    # ------------------------------
+    # JOIN / SPLIT
+    # ------------------------------
+    def join(self, texts):
+        merged = texts[0]
+        for text in texts[1:]:
+            # "exam-" + "ple" → "example"
+            if merged.endswith("-") and len(merged) > 1 and merged[-2].isalpha() \
+                    and text[:1].islower():
+                merged = merged[:-1] + text
+            else:
+                merged = merged + " " + text
+        return merged
+
+    def split(self, translated, blocks):
+        # Spread the translated words over the original lines in proportion
+        # to each line's share of the source text
+        if len(blocks) == 1:
+            return [translated]
+
+        words = translated.split()
+        parts = [[] for _ in blocks]
+        if not words:
+            return ["" for _ in blocks]
+
+        weights = [max(1, len(b["text"])) for b in blocks]
+        total_weight = float(sum(weights))
+        bounds = []
+        running = 0
+        for weight in weights:
+            running += weight
+            bounds.append(running / total_weight)
+
+        total_chars = float(sum(len(word) for word in words) + len(words) - 1)
+        pos = 0
+        line = 0
+        for word in words:
+            middle = (pos + len(word) / 2.0) / total_chars
+            while line < len(blocks) - 1 and middle > bounds[line]:
+                line += 1
+            parts[line].append(word)
+            pos += len(word) + 1
+
+        return [" ".join(part) for part in parts]
@@ -0,0 +1,65 @@
+from collections import defaultdict
+
+GRID_CELL_SIZE = 64.0    # points; ~ a few text lines per cell
+
+
+def box_area(box):
+    x0, y0, x1, y1 = box
+    return max(0.0, x1 - x0) * max(0.0, y1 - y0)
+
+
+def intersection_area(a, b):
+    w = min(a[2], b[2]) - max(a[0], b[0])
+    h = min(a[3], b[3]) - max(a[1], b[1])
+    if w <= 0 or h <= 0:
+        return 0.0
+    return w * h
+
+
+def contains(outer, inner):
+    return (inner[0] >= outer[0] and inner[2] <= outer[2] and
+            inner[1] >= outer[1] and inner[3] <= outer[3])
+
+
+def overlap_ratio(inner, outer):
+    # Fraction of `inner` covered by `outer` (1.0 = fully contained)
+    area = box_area(inner)
+    if area == 0:
+        # Degenerate (zero width/height) box: containment decides
+        return 1.0 if contains(outer, inner) else 0.0
+    return intersection_area(inner, outer) / area
+
+
+class GridIndex:
+    # Uniform grid over one page: every item is registered in each cell
+    # its (x0, top, x1, bottom) box touches, so a query only looks at
+    # items near the query box instead of every item on the page.
+
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.items = []
+
+    def _cell_range(self, box):
+        size = self.cell_size
+        return (
+            range(int(box[0] // size), int(box[2] // size) + 1),
+            range(int(box[1] // size), int(box[3] // size) + 1),
+        )
+
+    def insert(self, box, item):
+        idx = len(self.items)
+        self.items.append((box, item))
+        xs, ys = self._cell_range(box)
+        for cx in xs:
+            for cy in ys:
+                self.cells[(cx, cy)].append(idx)
+
+    def query(self, box):
+        # Candidates whose box touches the same grid cells, in insert order
+        found = set()
+        xs, ys = self._cell_range(box)
+        for cx in xs:
+            for cy in ys:
+                found.update(self.cells.get((cx, cy), ()))
+        return [self.items[i] for i in sorted(found)]
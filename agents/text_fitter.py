@@ -0,0 +1,90 @@
+MAX_FONT_SIZE = 12.0
+MIN_FONT_SIZE = 4.0
+LEADING = 1.2           # line step as a multiple of the font size
+SIZE_PRECISION = 0.25   # binary search stops at this resolution (points)
+
+
+class TextFitter:
+    # Finds the largest font size (and the wrapping at that size) that
+    # fits a text into a (w, h) box. Widths come from a cached width table
+    # (fonts.register_fonts.FontWidths), measured once per word at size 1,
+    # so every probe of the binary search is pure arithmetic.
+
+    def __init__(self, widths, max_size=MAX_FONT_SIZE, min_size=MIN_FONT_SIZE,
+                 leading=LEADING):
+        self.widths = widths
+        self.max_size = max_size
+        self.min_size = min_size
+        self.leading = leading
+
+    def _measure(self, text):
+        # [(paragraph words, unit widths), ...] + unit width of a space
+        space = self.widths.string_width(" ", 1)
+        paragraphs = []
+        for para in text.split("\n"):
+            words = para.split()
+            paragraphs.append((words, [self.widths.string_width(w, 1) for w in words]))
+        return paragraphs, space
+
+    def _wrap(self, paragraphs, space, size, width):
+        # Greedy wrap at `size`; returns (lines, widest line in points)
+        lines = []
+        widest = 0.0
+        limit = width / size
+
+        for words, unit_widths in paragraphs:
+            if not words:
+                lines.append("")
+                continue
+
+            current = [words[0]]
+            current_w = unit_widths[0]
+
+            for word, w in zip(words[1:], unit_widths[1:]):
+                if current_w + space + w <= limit:
+                    current.append(word)
+                    current_w += space + w
+                else:
+                    lines.append(" ".join(current))
+                    widest = max(widest, current_w)
+                    current = [word]
+                    current_w = w
+
+            lines.append(" ".join(current))
+            widest = max(widest, current_w)
+
+        return lines, widest * size
+
+    def _block_height(self, line_count, size):
+        # First line takes `size`, every following one a full line step
+        return size + (line_count - 1) * size * self.leading
+
+    def fit(self, text, width, height):
+        paragraphs, space = self._measure(text)
+
+        def fits(size):
+            lines, widest = self._wrap(paragraphs, space, size, width)
+            ok = widest <= width and self._block_height(len(lines), size) <= height
+            return ok, lines
+
+        high = max(self.min_size, min(self.max_size, height))
+        ok, lines = fits(high)
+        if ok:
+            return high, lines
+
+        low = self.min_size
+        ok, best_lines = fits(low)
+        if not ok:
+            # Nothing fits: smallest size, let it overflow
+            return low, best_lines
+
+        best = low
+        while high - low > SIZE_PRECISION:
+            mid = (low + high) / 2
+            ok, lines = fits(mid)
+            if ok:
+                best, best_lines, low = mid, lines, mid
+            else:
+                high = mid
+
+        return best, best_lines
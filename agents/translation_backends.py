@@ -0,0 +1,143 @@
+import os
+import random
+import threading
+import time
+
+from config import settings
+
+
+class Completion:
+
+    def __init__(self, text, total_tokens=None):
+        self.text = text
+        self.total_tokens = total_tokens
+
+
+class TranslationBackend:
+    # Interface: one prompt in, one Completion out.
+    name = "base"
+    model = "base"
+
+    def complete(self, prompt):
+        raise NotImplementedError
+
+
+# ------------------------------
+# OPENAI
+# ------------------------------
+def load_api_key(path=settings.API_KEY_PATH):
+    if os.environ.get("OPENAI_API_KEY"):
+        return
+    if os.path.isfile(path):
+        with open(path) as f:
+            os.environ["OPENAI_API_KEY"] = f.read().strip()
+
+
+class OpenAIBackend(TranslationBackend):
+    name = "openai"
+
+    def __init__(self, model=settings.OPENAI_MODEL, sdk_retries=True,
+                 base_url=None, api_key=None):
+        from openai import OpenAI
+
+        if api_key is None:
+            load_api_key()
+
+        kwargs = {}
+        if base_url:
+            kwargs["base_url"] = base_url
+        if api_key:
+            kwargs["api_key"] = api_key
+        if not sdk_retries:
+            # The RequestScheduler owns retries, the SDK must not retry too
+            kwargs["max_retries"] = 0
+
+        self.model = model
+        self.client = OpenAI(**kwargs)
+
+    def complete(self, prompt):
+        response = self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}]
+        )
+
+        usage = getattr(response, "usage", None)
+        return Completion(response.choices[0].message.content,
+                          getattr(usage, "total_tokens", None))
+
+
+class LocalModelBackend(OpenAIBackend):
+    # Local models served behind an OpenAI-compatible API (Ollama, vLLM, ...)
+    name = "local"
+
+    def __init__(self, model=settings.LOCAL_MODEL_NAME, sdk_retries=True,
+                 base_url=settings.LOCAL_MODEL_URL):
+        super().__init__(model=model, sdk_retries=sdk_retries,
+                         base_url=base_url, api_key="local")
+
+
+# ------------------------------
+# STUB (offline, deterministic)
+# ------------------------------
+def echo_translation(prompt):
+    # Echo the text-to-translate section upper-cased; ID tags and {#n}
+    # placeholders survive, exactly like with a well-behaved model.
+    marker = "TRANSLATE:\n"
+    if marker in prompt:
+        prompt = prompt.split(marker, 1)[1]
+    body = prompt.split("\n\n### OUTPUT", 1)[0]
+    return "\n".join(line.upper() for line in body.split("\n"))
+
+
+class StubBackendError(Exception):
+
+    def __init__(self, message, status_code=503):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class StubBackend(TranslationBackend):
+    name = "stub"
+    model = "stub"
+
+    def __init__(self, latency=settings.STUB_LATENCY, jitter=settings.STUB_JITTER,
+                 error_rate=settings.STUB_ERROR_RATE, seed=settings.STUB_SEED):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def complete(self, prompt):
+        with self.lock:
+            self.requests += 1
+            delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+            fail = self.rng.random() < self.error_rate
+
+        if delay > 0:
+            time.sleep(delay)
+
+        if fail:
+            raise StubBackendError("stub backend: injected transient error")
+
+        text = echo_translation(prompt)
+        return Completion(text, len(prompt) // 4 + len(text) // 4 + 2)
+
+
+BACKENDS = {
+    "openai": OpenAIBackend,
+    "stub": StubBackend,
+    "local": LocalModelBackend,
+}
+
+
+def create_backend(name=None, sdk_retries=True):
+    name = name or settings.TRANSLATION_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown translation backend: {name!r} "
+                         f"(choose from {', '.join(BACKENDS)})")
+
+    if name == "stub":
+        return StubBackend()
+    return BACKENDS[name](sdk_retries=sdk_retries)
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from agents.metrics import get_default_metrics
+
+CACHE_PATH = os.path.join("data", "translation_cache.sqlite")
+MEMORY_ENTRIES = 5000                 # in-memory LRU front
+MAX_DISK_BYTES = 200 * 1024 * 1024    # evict oldest rows above this size
+
+
+def normalize_text(text):
+    # Collapse runs of spaces per line but keep the line structure,
+    # since line breaks are part of what the translator must preserve.
+    lines = [" ".join(line.split()) for line in text.strip().split("\n")]
+    return "\n".join(lines)
+
+
+def make_key(text, target_lang, model, prompt_version):
+    raw = "\x1f".join([normalize_text(text), target_lang, model, str(prompt_version)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+
+    def __init__(self, path=CACHE_PATH, memory_entries=MEMORY_ENTRIES,
+                 max_disk_bytes=MAX_DISK_BYTES):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS translations (
+                   key TEXT PRIMARY KEY,
+                   translation TEXT NOT NULL,
+                   size INTEGER NOT NULL,
+                   last_used REAL NOT NULL
+               )"""
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_used ON translations(last_used)"
+        )
+        self.conn.commit()
+
+        row = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM translations").fetchone()
+        self.disk_bytes = row[0]
+
+    # ------------------------------
+    # LOOKUP
+    # ------------------------------
+    def get(self, text, target_lang, model, prompt_version):
+        key = make_key(text, target_lang, model, prompt_version)
+
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                self.memory_hits += 1
+                get_default_metrics().incr("translation_cache_lookups", result="memory_hit")
+                return self.memory[key]
+
+            row = self.conn.execute(
+                "SELECT translation FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                get_default_metrics().incr("translation_cache_lookups", result="miss")
+                return None
+
+            self.conn.execute(
+                "UPDATE translations SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self.conn.commit()
+
+            self._remember(key, row[0])
+            self.hits += 1
+            self.disk_hits += 1
+            get_default_metrics().incr("translation_cache_lookups", result="disk_hit")
+            return row[0]
+
+    # ------------------------------
+    # STORE
+    # ------------------------------
+    def put(self, text, translation, target_lang, model, prompt_version):
+        self.put_many([(text, translation)], target_lang, model, prompt_version)
+
+    def put_many(self, pairs, target_lang, model, prompt_version):
+        now = time.time()
+        unique = {}
+        for text, translation in pairs:
+            # An empty translation of a non-empty text is a failure, never cached
+            if not text or not text.strip() or not translation or not translation.strip():
+                continue
+            key = make_key(text, target_lang, model, prompt_version)
+            unique[key] = (key, translation, len(translation.encode("utf-8")), now)
+
+        rows = list(unique.values())
+
+        if not rows:
+            return
+
+        with self.lock:
+            for key, translation, _, _ in rows:
+                self._remember(key, translation)
+
+            for key, _, size, _ in rows:
+                old = self.conn.execute(
+                    "SELECT size FROM translations WHERE key = ?", (key,)
+                ).fetchone()
+                if old:
+                    self.disk_bytes -= old[0]
+                self.disk_bytes += size
+
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO translations (key, translation, size, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.commit()
+
+            if self.disk_bytes > self.max_disk_bytes:
+                self._evict()
+
+    def _remember(self, key, translation):
+        self.memory[key] = translation
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict(self):
+        # Drop least recently used rows until we are back under 90% of the limit
+        target = int(self.max_disk_bytes * 0.9)
+        cursor = self.conn.execute(
+            "SELECT key, size FROM translations ORDER BY last_used ASC"
+        )
+
+        doomed = []
+        for key, size in cursor:
+            if self.disk_bytes <= target:
+                break
+            doomed.append((key,))
+            self.disk_bytes -= size
+            self.memory.pop(key, None)
+
+        self.conn.executemany("DELETE FROM translations WHERE key = ?", doomed)
+        self.conn.commit()
+        self.evictions += len(doomed)
+        get_default_metrics().incr("translation_cache_evictions", len(doomed))
+
+    # ------------------------------
+    # STATS
+    # ------------------------------
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_bytes": self.disk_bytes,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+# One cache per process, so repeated uploads in the Flask app share the
+# warm in-memory front instead of starting cold every request.
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = TranslationCache()
+        return _default_cache
@@ -0,0 +1,210 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.segment_dedup import SegmentDeduplicator, is_segment
+from agents.segment_merger import SegmentMerger, MERGE_TOKEN_BUDGET
+from agents.metrics import get_default_metrics
+
+# Upper bound on translation requests that are in flight at the same time
+MAX_IN_FLIGHT = 8
+
+# Segments translated between two checkpoint journal writes
+# (~ a few rounds of in-flight batches)
+CHECKPOINT_SEGMENTS = 400
+
+
+class TranslationEngine:
+
+    def __init__(self, translator, max_in_flight=MAX_IN_FLIGHT, batched=True,
+                 dedup=True, mask_digits=False, progress=None, merge_segments=False,
+                 merge_token_budget=MERGE_TOKEN_BUDGET):
+        self.translator = translator
+        self.batched = batched
+        self.dedup = dedup
+        self.mask_digits = mask_digits
+        # Optional: paragraph lines merged into one segment before translation
+        self.merger = SegmentMerger(merge_token_budget) if merge_segments else None
+        self.dedup_stats = None
+        self.stats_lock = threading.Lock()
+        # progress("translate", segments done, segments total), summed over
+        # every translate_document call (one per page when streaming)
+        self.progress = progress
+        self.segments_done = 0
+        self.segments_total = 0
+        self.pool = ThreadPoolExecutor(max_workers=max_in_flight,
+                                       thread_name_prefix="translate")
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ------------------------------
+    # CORE: ordered parallel translation
+    # ------------------------------
+    def translate_texts(self, texts, target_lang="hi"):
+        if not self.dedup:
+            weights = [1 if is_segment(t) else 0 for t in texts]
+            return self._translate_ordered(texts, target_lang, weights)
+
+        # Identical segments (headers, footers, repeated cells) are
+        # translated once and fanned back out to every occurrence.
+        deduper = SegmentDeduplicator(mask_numbers=self.mask_digits)
+        unique = deduper.collapse(texts)
+
+        # Progress counts every occurrence a unique segment stands for
+        weights = [0] * len(unique)
+        for slot in deduper.slots:
+            if slot is not None:
+                weights[slot[0]] += 1
+
+        results, failed = deduper.expand(
+            self._translate_ordered(unique, target_lang, weights)
+        )
+
+        # A masked template that lost a {#n} placeholder → translate raw text
+        if failed:
+            retry = self._translate_ordered([texts[i] for i in failed], target_lang)
+            for idx, text in zip(failed, retry):
+                results[idx] = text
+
+        self._record_dedup(deduper.stats())
+        return results
+
+    def _record_dedup(self, stats):
+        # Accumulated over every call, so page-by-page (streaming) use
+        # still reports one figure per document.
+        with self.stats_lock:
+            if self.dedup_stats is None:
+                self.dedup_stats = stats
+                return
+
+            total = self.dedup_stats
+            for key in ("segments", "unique", "segments_saved"):
+                total[key] += stats[key]
+            segments = total["segments"]
+            total["dedup_ratio"] = (1 - total["unique"] / segments) if segments else 0.0
+
+    def _advance(self, done=0, total=0):
+        with self.stats_lock:
+            self.segments_done += done
+            self.segments_total += total
+            done, total = self.segments_done, self.segments_total
+        if self.progress:
+            self.progress("translate", done, total)
+
+    def _translate_ordered(self, texts, target_lang, weights=None):
+        if self.batched:
+            batches = self.translator.make_batches(texts)
+        else:
+            batches = [[i] for i in range(len(texts))]
+
+        futures = []
+        for batch in batches:
+            fut = self.pool.submit(self.translator.translate_batch,
+                                   [texts[i] for i in batch], target_lang)
+            futures.append((batch, fut))
+
+        # Results are written back by index, so output order == input order
+        # no matter which request finishes first.
+        results = ["" for _ in texts]
+        for batch, fut in futures:
+            for idx, text in zip(batch, fut.result()):
+                results[idx] = text
+            if weights:
+                self._advance(done=sum(weights[i] for i in batch))
+
+        return results
+
+    # ------------------------------
+    # BLOCKS + TABLES in one work queue
+    # ------------------------------
+    def translate_document(self, blocks, tables, target_lang="hi", checkpoint=None):
+        with get_default_metrics().span("translate"):
+            return self._translate_document(blocks, tables, target_lang, checkpoint)
+
+    def _translate_document(self, blocks, tables, target_lang, checkpoint):
+        if self.merger is None:
+            groups = [[i] for i in range(len(blocks))]
+            texts = [b["text"] for b in blocks]
+        else:
+            groups = self.merger.group(blocks)
+            texts = [self.merger.join([blocks[i]["text"] for i in g]) for g in groups]
+
+        # Single lines keep their b<n> id, so journals stay compatible
+        segment_ids = [f"b{g[0]}" if len(g) == 1 else f"m{g[0]}.{len(g)}" for g in groups]
+
+        cell_positions = []
+        for ti, tbl in enumerate(tables):
+            for r, row in enumerate(tbl["data"]):
+                for c, cell in enumerate(row):
+                    if cell and isinstance(cell, str):
+                        cell_positions.append((ti, r, c))
+                        texts.append(cell)
+                        segment_ids.append(f"t{ti}.{r}.{c}")
+
+        self._advance(total=sum(1 for t in texts if is_segment(t)))
+
+        if checkpoint is None:
+            translated = self.translate_texts(texts, target_lang)
+        else:
+            translated = self._translate_checkpointed(texts, segment_ids,
+                                                      target_lang, checkpoint)
+
+        # Merged segments are spread back over their original lines
+        block_texts = [""] * len(blocks)
+        for g, text in zip(groups, translated):
+            if len(g) == 1:
+                block_texts[g[0]] = text
+                continue
+            for idx, part in zip(g, self.merger.split(text, [blocks[i] for i in g])):
+                block_texts[idx] = part
+
+        translated_blocks = []
+        for block, text in zip(blocks, block_texts):
+            new_block = block.copy()
+            new_block["text"] = text
+            translated_blocks.append(new_block)
+
+        translated_tables = []
+        for tbl in tables:
+            t = tbl.copy()
+            t["data"] = [list(row) for row in tbl["data"]]
+            translated_tables.append(t)
+
+        for (ti, r, c), text in zip(cell_positions, translated[len(groups):]):
+            translated_tables[ti]["data"][r][c] = text
+
+        return translated_blocks, translated_tables
+
+    def _translate_checkpointed(self, texts, segment_ids, target_lang, checkpoint):
+        # Segments already in the journal are reused; the rest is translated
+        # in slices, each slice journaled as soon as it completes.
+        done = checkpoint.load_segments()
+        results = [done.get(sid) for sid in segment_ids]
+        pending = [i for i, text in enumerate(results) if text is None]
+        self._advance(done=sum(1 for i, text in enumerate(texts)
+                               if results[i] is not None and is_segment(text)))
+
+        print(f"Checkpoint: {len(texts) - len(pending)} segments reused, "
+              f"{len(pending)} to translate")
+
+        for start in range(0, len(pending), CHECKPOINT_SEGMENTS):
+            chunk = pending[start:start + CHECKPOINT_SEGMENTS]
+            translated = self.translate_texts([texts[i] for i in chunk], target_lang)
+            checkpoint.record([segment_ids[i] for i in chunk], translated)
+            for idx, text in zip(chunk, translated):
+                results[idx] = text
+
+        return results
+
+    def translate_blocks(self, blocks, target_lang="hi"):
+        return self.translate_document(blocks, [], target_lang)[0]
+
+    def translate_table(self, table_data, target_lang="hi"):
+        tables = self.translate_document([], [{"data": table_data}], target_lang)[1]
+        return tables[0]["data"]
@@ -0,0 +1,235 @@
+"""
+End-to-end pipeline benchmark.
+
+Generates synthetic PDFs with reportlab (multi-column text, table-dense
+pages, image-heavy pages, or a mix of all three), then runs the three
+pipeline stages on each one:
+
+    extract    PDFBlockExtractor.extract
+    translate  TranslationEngine over a latency-simulating StubBackend
+    rebuild    PDFRebuilder.rebuild
+
+Every case runs in a fresh process so its peak RSS is its own. Wall time,
+per-stage time, peak RSS and input/output sizes are written to a JSON file
+(default benchmarks/results/pipeline_<timestamp>.json) for comparing runs.
+
+    python benchmarks/bench_pipeline.py --pages 10 100 1000 --kinds mixed tables
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from agents.block_extractor import PDFBlockExtractor
+from agents.block_translator import BlockTranslator
+from agents.translation_engine import TranslationEngine
+from agents.translation_backends import StubBackend
+from agents.pdf_rebuilder import PDFRebuilder
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+KINDS = ("multicolumn", "tables", "images", "mixed")
+WORDS = ("invoice total amount tax period account payment customer service "
+         "report quarter revenue growth market policy delivery order balance "
+         "statement contract schedule review summary details section").split()
+DISTINCT_IMAGES = 6
+SEED = 42
+
+
+# ------------------------------
+# SYNTHETIC CORPUS
+# ------------------------------
+def sentence(rng, words=8):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_images(rng):
+    # A handful of distinct noisy images, reused across pages like logos/figures
+    readers = []
+    for _ in range(DISTINCT_IMAGES):
+        img = Image.effect_noise((160, 120), rng.randint(20, 80)).convert("RGB")
+        readers.append(ImageReader(img))
+    return readers
+
+
+def draw_header(c, rng, pnum):
+    width, height = A4
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, height - 40, "Synthetic Benchmark Document")
+    c.setFont("Helvetica", 8)
+    c.drawString(50, 30, f"Page {pnum}")
+
+
+def draw_multicolumn(c, rng):
+    width, height = A4
+    col_width = (width - 100 - 20) / 2
+    c.setFont("Helvetica", 9)
+    for col in range(2):
+        x = 50 + col * (col_width + 20)
+        y = height - 70
+        while y > 60:
+            c.drawString(x, y, sentence(rng, 6))
+            y -= 12
+            if rng.random() < 0.15:     # paragraph break
+                y -= 8
+
+
+def draw_tables(c, rng):
+    width, height = A4
+    c.setFont("Helvetica", 8)
+    top = height - 70
+    for _ in range(3):
+        rows, cols = 8, 4
+        cell_w = (width - 100) / cols
+        cell_h = 14
+        for r in range(rows + 1):
+            c.line(50, top - r * cell_h, width - 50, top - r * cell_h)
+        for col in range(cols + 1):
+            c.line(50 + col * cell_w, top, 50 + col * cell_w, top - rows * cell_h)
+        for r in range(rows):
+            for col in range(cols):
+                text = rng.choice(WORDS) if r == 0 else f"{rng.choice(WORDS)} {rng.randint(1, 999)}"
+                c.drawString(54 + col * cell_w, top - r * cell_h - 10, text)
+        top -= rows * cell_h + 40
+
+
+def draw_images(c, rng, images):
+    width, height = A4
+    y = height - 200
+    for row in range(3):
+        for col in range(3):
+            c.drawImage(rng.choice(images), 50 + col * 170, y - row * 220, width=150, height=110)
+            c.setFont("Helvetica", 8)
+            c.drawString(50 + col * 170, y - row * 220 - 12, sentence(rng, 4))
+
+
+def make_pdf(path, pages, kind, seed=SEED):
+    rng = random.Random(seed)
+    images = make_images(rng)
+    c = canvas.Canvas(path, pagesize=A4)
+
+    for pnum in range(1, pages + 1):
+        page_kind = KINDS[(pnum - 1) % 3] if kind == "mixed" else kind
+        draw_header(c, rng, pnum)
+        if page_kind == "multicolumn":
+            draw_multicolumn(c, rng)
+        elif page_kind == "tables":
+            draw_tables(c, rng)
+        else:
+            draw_images(c, rng, images)
+        c.showPage()
+
+    c.save()
+    return path
+
+
+# ------------------------------
+# ONE CASE (runs in its own process)
+# ------------------------------
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_case(pages, kind, latency):
+    with tempfile.TemporaryDirectory() as tmp:
+        input_pdf = make_pdf(os.path.join(tmp, "input.pdf"), pages, kind)
+        output_pdf = os.path.join(tmp, "output.pdf")
+        stages = {}
+        total_start = time.perf_counter()
+
+        start = time.perf_counter()
+        data = PDFBlockExtractor(input_pdf, images_in_memory=True).extract()
+        stages["extract"] = time.perf_counter() - start
+        rss_extract = peak_rss_mb()
+
+        # No translation cache: every run measures a cold document
+        backend = StubBackend(latency=latency, jitter=latency * 0.4)
+        translator = BlockTranslator(backend=backend)
+        start = time.perf_counter()
+        with TranslationEngine(translator) as engine:
+            blocks, tables = engine.translate_document(data["blocks"], data["tables"], "hi")
+        stages["translate"] = time.perf_counter() - start
+        rss_translate = peak_rss_mb()
+
+        start = time.perf_counter()
+        PDFRebuilder(data["page_sizes"]).rebuild(output_pdf, blocks, data["images"], tables)
+        stages["rebuild"] = time.perf_counter() - start
+
+        return {
+            "pages": pages,
+            "kind": kind,
+            "wall_s": time.perf_counter() - total_start,
+            "stages_s": stages,
+            "peak_rss_mb": {
+                "extract": rss_extract,
+                "translate": rss_translate,
+                "total": peak_rss_mb(),
+            },
+            "blocks": len(data["blocks"]),
+            "tables": len(data["tables"]),
+            "images": len(data["images"]),
+            "api_requests": backend.requests,
+            "dedup": engine.dedup_stats,
+            "input_bytes": os.path.getsize(input_pdf),
+            "output_bytes": os.path.getsize(output_pdf),
+        }
+
+
+def run(page_counts, kinds, latency, output=None):
+    results = []
+
+    for kind in kinds:
+        for pages in page_counts:
+            # Fresh worker per case → peak RSS is not inherited from earlier cases
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                result = pool.submit(run_case, pages, kind, latency).result()
+            results.append(result)
+
+            s = result["stages_s"]
+            print(f"{kind:12s} {pages:5d} pages  wall {result['wall_s']:8.2f}s  "
+                  f"extract {s['extract']:7.2f}s  translate {s['translate']:7.2f}s  "
+                  f"rebuild {s['rebuild']:7.2f}s  rss {result['peak_rss_mb']['total']:7.1f}MB  "
+                  f"out {result['output_bytes'] / 1024:8.1f}KB")
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "stub_latency_s": latency,
+        "results": results,
+    }
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"pipeline_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Results written to {output}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=["mixed"])
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="simulated seconds per translation request")
+    parser.add_argument("--output", help="JSON file (default benchmarks/results/...)")
+    args = parser.parse_args()
+
+    run(args.pages, args.kinds, args.latency, args.output)
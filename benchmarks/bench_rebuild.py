@@ -0,0 +1,70 @@
+"""
+Rebuild scaling benchmark.
+
+Feeds PDFRebuilder.rebuild synthetic pages (text lines + one table per
+page) and prints the time per page for growing documents. With the
+per-page index the time per page stays flat as the page count grows;
+the old full-list scan grew linearly per page (quadratic overall).
+
+    python benchmarks/bench_rebuild.py --pages 50 100 200 400 800
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.pdf_rebuilder import PDFRebuilder
+
+PAGE_SIZE = (612.0, 792.0)
+
+
+def synthetic_document(pages, lines_per_page=40):
+    blocks = []
+    tables = []
+
+    for pnum in range(1, pages + 1):
+        for i in range(lines_per_page):
+            blocks.append({
+                "page": pnum,
+                "bbox": [50.0, 60.0 + i * 14, 300.0, 10.0],
+                "text": f"Page {pnum} line {i} of the synthetic benchmark document",
+            })
+        tables.append({
+            "page": pnum,
+            "bbox": (350.0, 60.0, 560.0, 140.0),
+            "data": [["Item", "Qty"], [f"Row {pnum}", "1"]],
+            "col_widths": [140.0, 70.0],
+        })
+
+    return blocks, tables
+
+
+def run(page_counts, lines_per_page):
+    results = []
+
+    for pages in page_counts:
+        blocks, tables = synthetic_document(pages, lines_per_page)
+        page_sizes = {p: PAGE_SIZE for p in range(1, pages + 1)}
+
+        with tempfile.TemporaryDirectory() as tmp:
+            rebuilder = PDFRebuilder(page_sizes)
+            start = time.perf_counter()
+            rebuilder.rebuild(os.path.join(tmp, "out.pdf"), blocks, [], tables)
+            elapsed = time.perf_counter() - start
+
+        results.append((pages, elapsed))
+        print(f"{pages:6d} pages  {elapsed:8.3f}s  {elapsed / pages * 1000:7.2f} ms/page")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDFRebuilder scaling benchmark")
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 100, 200, 400])
+    parser.add_argument("--lines", type=int, default=40, help="text lines per page")
+    args = parser.parse_args()
+
+    run(args.pages, args.lines)
@@ -1,9 +1,80 @@
 import os
 
-# Load OpenAI Key
-with open("data/api_key.txt") as f:
-    os.environ["OPENAI_API_KEY"] = f.read().strip()
+# OpenAI Key is loaded lazily by the OpenAI backend, so the stub and
+# local backends work on machines without data/api_key.txt
+API_KEY_PATH = os.path.join("data", "api_key.txt")
 
 OPENAI_MODEL = "gpt-4o-mini"
 TARGET_LANG = "hi"
 SOURCE_LANG = "en"
+
+# Translation backend: "openai" | "stub" | "local"
+TRANSLATION_BACKEND = os.environ.get("TRANSLATION_BACKEND", "openai")
+
+# Translation requests in flight at once per document (the shared rate
+# limiter still paces them against the provider quota)
+TRANSLATION_MAX_IN_FLIGHT = int(os.environ.get("TRANSLATION_MAX_IN_FLIGHT", "8"))
+
+# Stub backend (offline, deterministic) — for benchmarking / load tests
+STUB_LATENCY = 0.05       # seconds per request
+STUB_JITTER = 0.02        # +/- seconds added to the latency
+STUB_ERROR_RATE = 0.0     # fraction of requests failing with a fake 503
+STUB_SEED = 1234
+
+# Local backend — any OpenAI-compatible server (Ollama, vLLM, llama.cpp)
+LOCAL_MODEL_URL = os.environ.get("LOCAL_MODEL_URL", "http://localhost:11434/v1")
+LOCAL_MODEL_NAME = os.environ.get("LOCAL_MODEL_NAME", "llama3.1")
+
+# PDF extraction — process pool over page ranges (1 = serial)
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", "1"))
+EXTRACT_CHUNK_SIZE = 25
+TABLE_OVERLAP_THRESHOLD = 1.0   # drop text lines this much inside a table
+# Hand images to the rebuilder as bytes instead of files in
+# processed_output/images (no disk round trip, no clashes between jobs)
+IMAGES_IN_MEMORY = os.environ.get("IMAGES_IN_MEMORY", "1") == "1"
+
+# Segment merging (optional): consecutive lines of one paragraph are sent
+# as one translation unit (up to MERGE_TOKEN_BUDGET estimated tokens) and
+# the translation is spread back over the original line bboxes
+MERGE_SEGMENTS = os.environ.get("MERGE_SEGMENTS", "0") == "1"
+MERGE_TOKEN_BUDGET = 250
+
+# Streaming pipeline: pages flow extract → translate → rebuild through
+# bounded queues instead of whole-document stages
+STREAMING = os.environ.get("STREAMING", "0") == "1"
+STREAM_QUEUE_PAGES = 4     # pages buffered (and in translation) per stage
+STREAM_FLUSH_PAGES = int(os.environ.get("STREAM_FLUSH_PAGES", "50"))  # redraw: pages per chunk PDF
+
+# Checkpoint/resume (whole-document pipeline): extraction snapshot + journal
+# of translated segments per input hash + pipeline settings, reused when the
+# same file is rerun after a failure; removed once the output PDF is written
+CHECKPOINTS = os.environ.get("CHECKPOINTS", "1") == "1"
+CHECKPOINT_DIR = os.path.join("data", "checkpoints")
+
+# Rebuild engine: "redraw" = new reportlab PDF (PDFRebuilder),
+# "overlay" = edit the source PDF in place with PyMuPDF (PDFOverlayRebuilder)
+REBUILD_MODE = os.environ.get("REBUILD_MODE", "redraw")
+# Redraw mode only: page ranges rendered in a process pool, then merged
+# (1 = serial). The streaming pipeline always draws page by page.
+REBUILD_WORKERS = int(os.environ.get("REBUILD_WORKERS", "1"))
+REBUILD_CHUNK_SIZE = 50
+
+# Flask UI uploads above this size are rejected with 413
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", str(256 * 1024 * 1024)))
+
+# Flask UI job queue: uploads run in the background, the POST returns a job ID
+JOB_QUEUE = os.environ.get("JOB_QUEUE", "local")
+MAX_CONCURRENT_JOBS = int(os.environ.get("MAX_CONCURRENT_JOBS", "2"))
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", "50"))
+
+# Flask UI result cache: translated PDFs in output/ keyed by (input hash,
+# language, pipeline version). Bump PIPELINE_VERSION when output changes.
+PIPELINE_VERSION = 1
+RESULT_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+RESULT_CACHE_MAX_ENTRIES = 1000
+
+# Metrics: counters + stage / API timings, always served as Prometheus text
+# on the Flask app's /metrics. "json" also appends every observation to
+# METRICS_LOG_PATH; "none" keeps them in memory only.
+METRICS_SINK = os.environ.get("METRICS_SINK", "none")
+METRICS_LOG_PATH = os.path.join("data", "metrics.jsonl")
@@ -1,23 +1,97 @@
 import os
+import threading
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
 FONT_NAME = "NotoDeva"
+FALLBACK_FONT_NAME = "FallbackUnicode"
+
+FONTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEVANAGARI_TTF = os.path.join(FONTS_DIR, "NotoSansDevanagari-Regular.ttf")
+FALLBACK_TTF = os.path.join(FONTS_DIR, "NotoSansDevanagari-VariableFont_wdth,wght.ttf")
+
+# Process-wide registry: every TTF is parsed and registered with reportlab
+# ONCE, no matter how many PDFRebuilders (Flask uploads) ask for it.
+_lock = threading.Lock()
+_registered = {}     # font name → True (registered) / False (failed)
+_widths = {}         # font name → FontWidths
+
+
+def register_font(name, path):
+    with _lock:
+        if name in _registered:
+            return name if _registered[name] else None
+
+        if not os.path.isfile(path):
+            print("ERROR: Font file not found:", path)
+            _registered[name] = False
+            return None
+
+        try:
+            pdfmetrics.registerFont(TTFont(name, path))
+            print("SUCCESS: Registered font:", name)
+            _registered[name] = True
+            return name
+        except Exception as e:
+            print("FONT LOAD ERROR:", e)
+            _registered[name] = False
+            return None
+
 
 def register_indic_fonts():
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    font_path = os.path.join(base_dir, "fonts", "NotoSansDevanagari-Regular.ttf")
-
-    print("FONT PATH:", font_path)
-
-    if not os.path.isfile(font_path):
-        print("ERROR: Font file not found:", font_path)
-        return None
-
-    try:
-        pdfmetrics.registerFont(TTFont(FONT_NAME, font_path))
-        print("SUCCESS: Registered font:", FONT_NAME)
-        return FONT_NAME
-    except Exception as e:
-        print("FONT LOAD ERROR:", e)
-        return None
+    return register_font(FONT_NAME, DEVANAGARI_TTF)
+
+
+def register_fallback_font():
+    return register_font(FALLBACK_FONT_NAME, FALLBACK_TTF)
+
+
+# ------------------------------
+# GLYPH WIDTHS
+# ------------------------------
+class FontWidths:
+    # Advance widths (1/1000 em) per code point, precomputed once, so text
+    # can be measured without going through the font again.
+
+    def __init__(self, name):
+        self.name = name
+        font = pdfmetrics.getFont(name)
+        face = getattr(font, "face", None)
+
+        if face is not None and hasattr(face, "charWidths"):
+            self.widths = dict(face.charWidths)
+            self.default = face.defaultWidth
+        else:
+            # Standard Type1 fonts: filled lazily from reportlab's tables
+            self.widths = {}
+            self.default = None
+
+    def char_width(self, ch):
+        code = ord(ch)
+        width = self.widths.get(code)
+        if width is None:
+            if self.default is not None:
+                return self.default
+            width = pdfmetrics.stringWidth(ch, self.name, 1000)
+            self.widths[code] = width
+        return width
+
+    def string_width(self, text, size):
+        widths = self.widths
+        default = self.default
+        if default is not None:
+            total = sum(widths.get(ord(ch), default) for ch in text)
+        else:
+            total = sum(self.char_width(ch) for ch in text)
+        return total * size / 1000.0
+
+
+def get_font_widths(name):
+    widths = _widths.get(name)
+    if widths is None:
+        with _lock:
+            widths = _widths.get(name)
+            if widths is None:
+                widths = FontWidths(name)
+                _widths[name] = widths
+    return widths
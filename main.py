@@ -1,17 +1,126 @@
 import os
-from agents.block_extractor import PDFBlockExtractor
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+
+from config import settings
+from agents.block_extractor import PDFBlockExtractor, is_path
 #from agents.extractor_old import PDFExtractor
-from agents.block_translator import BlockTranslator
+from agents.block_translator import BlockTranslator, PROMPT_VERSION
+from agents.translation_engine import TranslationEngine
+from agents.checkpoint import TranslationCheckpoint
+from agents.translation_cache import get_default_cache
+from agents.rate_limiter import get_default_scheduler
+from agents.translation_backends import create_backend
+from agents.metrics import get_default_metrics
 #from agents.pdf_rebuilder import PDFRebuilder
 from agents.pdf_rebuilder import PDFRebuilder
+from agents.overlay_rebuilder import PDFOverlayRebuilder
 from agents.hindi_mapper import map_hindi_to_blocks   # only if you use mapping
 
 
-def process_pdf(input_pdf, output_pdf):
+def make_translator(backend=None):
+    # backend=None → TRANSLATION_BACKEND from config/settings.py
+    return BlockTranslator(
+        cache=get_default_cache(),
+        scheduler=get_default_scheduler(),
+        backend=create_backend(backend, sdk_retries=False),
+    )
+
+
+def make_engine(translator, progress=None):
+    return TranslationEngine(
+        translator,
+        max_in_flight=settings.TRANSLATION_MAX_IN_FLIGHT,
+        progress=progress,
+        merge_segments=settings.MERGE_SEGMENTS,
+        merge_token_budget=settings.MERGE_TOKEN_BUDGET,
+    )
+
+
+def make_rebuilder(input_pdf, page_sizes, progress=None, flush_pages=0):
+    if settings.REBUILD_MODE == "overlay":
+        return PDFOverlayRebuilder(input_pdf, progress=progress)
+    return PDFRebuilder(
+        page_sizes,
+        workers=settings.REBUILD_WORKERS,
+        chunk_size=settings.REBUILD_CHUNK_SIZE,
+        progress=progress,
+        flush_pages=flush_pages,
+    )
+
+
+def checkpoint_version(translator):
+    # Everything that changes the extraction snapshot or the journaled text:
+    # a checkpoint written under other settings is never reused
+    backend = translator.backend
+    return "/".join(str(part) for part in [
+        backend.name, backend.model, PROMPT_VERSION,
+        settings.MERGE_SEGMENTS, settings.MERGE_TOKEN_BUDGET,
+        settings.TABLE_OVERLAP_THRESHOLD, settings.IMAGES_IN_MEMORY,
+    ])
+
+
+def record_document(metrics, input_pdf, output_pdf, start, mode):
+    # Whole-document figures + one snapshot of every metric for the sinks
+    metrics.observe("document_seconds", time.perf_counter() - start, mode=mode)
+    metrics.incr("documents_processed", mode=mode)
+    metrics.emit_snapshot(input=os.path.basename(input_pdf),
+                          output=os.path.basename(output_pdf))
+
 
-    print("\n🔍 STEP 1 — Extracting PDF blocks/images/tables...")
-    extractor = PDFBlockExtractor(input_pdf)
-    data = extractor.extract()
+def process_pdf(input_pdf, output_pdf, backend=None, streaming=None, progress=None,
+                input_hash=None):
+    # progress(stage, done, total) is called as pages are extracted
+    # ("extract"), segments translated ("translate") and pages rebuilt ("rebuild")
+    # The pipeline needs a file on disk (checkpoint hash, page count, overlay
+    # source); bytes / mmap input is only supported by PDFBlockExtractor itself
+    if not is_path(input_pdf):
+        raise TypeError("process_pdf needs a PDF file path, got "
+                        f"{type(input_pdf).__name__}")
+    if streaming is None:
+        streaming = settings.STREAMING
+    if streaming:
+        return process_pdf_streaming(input_pdf, output_pdf, backend, progress)
+
+    metrics = get_default_metrics()
+    start = time.perf_counter()
+
+    translator = make_translator(backend)
+
+    # Journal of the extraction + every translated segment, keyed by the
+    # input hash and pipeline settings: a rerun after a crash resumes
+    # instead of starting over
+    checkpoint = None
+    if settings.CHECKPOINTS:
+        # input_hash: SHA-256 already computed by the caller (upload), saves
+        # re-reading the whole file just to name the checkpoint
+        checkpoint = TranslationCheckpoint(input_pdf, "hi", root=settings.CHECKPOINT_DIR,
+                                           input_hash=input_hash,
+                                           version=checkpoint_version(translator))
+
+    data = checkpoint.load_extraction() if checkpoint else None
+    if data is not None:
+        print("\n🔍 STEP 1 — Reusing checkpointed extraction...")
+        if progress:
+            progress("extract", len(data["page_sizes"]), len(data["page_sizes"]))
+    else:
+        print("\n🔍 STEP 1 — Extracting PDF blocks/images/tables...")
+        extractor = PDFBlockExtractor(
+            input_pdf,
+            workers=settings.EXTRACT_WORKERS,
+            chunk_size=settings.EXTRACT_CHUNK_SIZE,
+            table_overlap=settings.TABLE_OVERLAP_THRESHOLD,
+            images_in_memory=settings.IMAGES_IN_MEMORY,
+            progress=progress,
+        )
+        with metrics.span("extract"):
+            data = extractor.extract()
+        if checkpoint:
+            checkpoint.save_extraction(data)
 
     original_blocks = data["blocks"]
     images = data["images"]
@@ -21,15 +130,19 @@ def process_pdf(input_pdf, output_pdf):
     print(f"Total blocks extracted: {len(original_blocks)}")
 
     # -------------------------------------------------------
-    # 🔥 STEP 2 — Translate English → Hindi
+    # 🔥 STEP 2 + 3 — Translate text blocks AND table cells
+    # English → Hindi through one shared, bounded work queue
     # -------------------------------------------------------
-    print("\n🌐 STEP 2 — Translating Text blocks to Hindi...")
-    translator = BlockTranslator()
-    translated_blocks = translator.translate_blocks(original_blocks, target_lang="hi")
-
-   
+    print("\n🌐 STEP 2 — Translating Text blocks + Tabular Text to Hindi...")
+    with make_engine(translator, progress) as engine:
+        translated_blocks, translated_tables = engine.translate_document(
+            original_blocks, tables, target_lang="hi", checkpoint=checkpoint
+        )
 
     print(f"Translated blocks: {len(translated_blocks)}")
+    print(f"Segment dedup: {engine.dedup_stats}")
+    print(f"Translation cache: {translator.cache.stats()}")
+    print(f"API scheduler: {translator.scheduler.stats()}")
 
     # -------------------------------------------------------
     # OPTIONAL: Hindi mapping (only if needed)
@@ -43,26 +156,181 @@ def process_pdf(input_pdf, output_pdf):
     for b in final_blocks[:3]:
         print(f"[PAGE {b['page']}] {b['text'][:100]}...")
 
-
-    print("\n🌐 STEP 3 — Translating Tabular Text to Hindi...")
-    translated_tables = []
-    for tbl in tables:
-        t = tbl.copy()
-        t["data"] = translator.translate_table(tbl["data"], target_lang="hi")
-        translated_tables.append(t)
-
     # -------------------------------------------------------
     # 🧱 STEP 3 — Rebuild clean Hindi PDF
     # -------------------------------------------------------
     print("\n🌐STEP 4 — Rebuilding Hindi PDF...")
-    rebuilder = PDFRebuilder(page_sizes)
+    rebuilder = make_rebuilder(input_pdf, page_sizes, progress)
+
+    with metrics.span("rebuild"):
+        rebuilder.rebuild(
+            output_path=output_pdf,
+            blocks=final_blocks,  # ONLY HINDI BLOCKS!
+            images=images,
+            tables=translated_tables,
+        )
+
+    # Output written: nothing left to resume
+    if checkpoint:
+        checkpoint.clear()
+
+    record_document(metrics, input_pdf, output_pdf, start, mode="batch")
+
+    print("\n🎉 PDF processing completed successfully!")
+    print(f"Output saved at: {output_pdf}")
 
-    rebuilder.rebuild(
-        output_path=output_pdf,
-        blocks=final_blocks,  # ONLY HINDI BLOCKS!
-        images=images,
-        tables=translated_tables,
+
+# -------------------------------------------------------
+# 🚰 STREAMING — extract → translate → rebuild page by page
+# Pages flow through bounded queues, so only a few pages are
+# in flight and extraction (CPU) overlaps translation (network).
+# Redraw output is flushed to chunk PDFs as it goes; overlay mode
+# still edits the whole source document in memory.
+# -------------------------------------------------------
+_DONE = object()
+_POLL_SECONDS = 0.1
+
+
+def _put(q, item, stop):
+    # Blocking put that gives up once the consumer has stopped
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _get(q, stop):
+    while not stop.is_set():
+        try:
+            return q.get(timeout=_POLL_SECONDS)
+        except queue.Empty:
+            pass
+    return _DONE
+
+
+def _extract_stage(extractor, pages, stop):
+    page_iter = extractor.iter_pages()
+    try:
+        for page in page_iter:
+            if not _put(pages, page, stop):
+                return
+    except BaseException as e:
+        _put(pages, e, stop)
+        return
+    finally:
+        # Runs the generator's cleanup → source documents closed
+        page_iter.close()
+    _put(pages, _DONE, stop)
+
+
+def _translate_stage(engine, pages, translated, page_pool, stop):
+    while True:
+        page = _get(pages, stop)
+        if page is _DONE or isinstance(page, BaseException):
+            _put(translated, page, stop)
+            return
+
+        # Several pages may be in translation at once; the bounded
+        # `translated` queue caps how many.
+        future = page_pool.submit(
+            engine.translate_document, page["blocks"], page["tables"], target_lang="hi"
+        )
+        if not _put(translated, (page, future), stop):
+            future.cancel()
+            return
+
+
+def _drain(q):
+    # Cancel the translations nobody will consume
+    while True:
+        try:
+            item = q.get_nowait()
+        except queue.Empty:
+            return
+        if isinstance(item, tuple):
+            item[1].cancel()
+
+
+def process_pdf_streaming(input_pdf, output_pdf, backend=None, progress=None):
+    print("\n🚰 Streaming pipeline — extract → translate → rebuild per page...")
+    metrics = get_default_metrics()
+    start = time.perf_counter()
+
+    extractor = PDFBlockExtractor(
+        input_pdf,
+        table_overlap=settings.TABLE_OVERLAP_THRESHOLD,
+        images_in_memory=settings.IMAGES_IN_MEMORY,
+        progress=progress,
     )
+    translator = make_translator(backend)
+    # Redraw mode writes a chunk PDF every STREAM_FLUSH_PAGES pages, so the
+    # output is never held in memory as a whole
+    rebuilder = make_rebuilder(input_pdf, {}, flush_pages=settings.STREAM_FLUSH_PAGES)
+
+    with fitz.open(input_pdf) as doc:
+        total_pages = doc.page_count
+
+    depth = settings.STREAM_QUEUE_PAGES
+    pages = queue.Queue(maxsize=depth)
+    translated = queue.Queue(maxsize=depth)
+
+    # Set on exit (success or failure): the stage threads stop waiting on
+    # the bounded queues, close the source documents and return
+    stop = threading.Event()
+
+    with make_engine(translator, progress) as engine, \
+            ThreadPoolExecutor(max_workers=depth, thread_name_prefix="page") as page_pool:
+
+        stages = [
+            threading.Thread(target=_extract_stage, args=(extractor, pages, stop),
+                             daemon=True),
+            threading.Thread(target=_translate_stage,
+                             args=(engine, pages, translated, page_pool, stop),
+                             daemon=True),
+        ]
+        for thread in stages:
+            thread.start()
+
+        try:
+            rebuilder.begin(output_pdf)
+            page_count = 0
+
+            while True:
+                item = translated.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+
+                page, future = item
+                blocks, tables = future.result()
+
+                rebuilder.draw_page(page["page"], blocks, page["images"], tables,
+                                    page_size=page["page_size"])
+                page_count += 1
+                if progress:
+                    progress("rebuild", page_count, total_pages)
+
+            rebuilder.finish()
+        except BaseException:
+            rebuilder.abort()
+            raise
+        finally:
+            stop.set()
+            for thread in stages:
+                thread.join()
+            _drain(translated)
+            _drain(pages)
+
+    record_document(metrics, input_pdf, output_pdf, start, mode="streaming")
+
+    print(f"Pages rebuilt: {page_count}")
+    print(f"Segment dedup: {engine.dedup_stats}")
+    print(f"Translation cache: {translator.cache.stats()}")
+    print(f"API scheduler: {translator.scheduler.stats()}")
 
     print("\n🎉 PDF processing completed successfully!")
     print(f"Output saved at: {output_pdf}")
@@ -0,0 +1,131 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Echoes the text to translate back (upper-cased) and can inject throttling
+and transient server errors, so the scheduler in agents/rate_limiter.py
+can be exercised without a network:
+
+    python tools/fake_openai_server.py --port 8099 --throttle-rate 0.2 --error-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=fake python main.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.translation_backends import echo_translation
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+
+    throttle_rate = 0.0
+    error_rate = 0.0
+    retry_after = 1
+    latency = 0.0
+    rpm_limit = 0
+
+    window = []
+    lock = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _over_rpm_limit(self):
+        if not self.rpm_limit:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            while self.window and now - self.window[0] > 60:
+                self.window.pop(0)
+            if len(self.window) >= self.rpm_limit:
+                return True
+            self.window.append(now)
+        return False
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self._over_rpm_limit() or random.random() < self.throttle_rate:
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                       {"Retry-After": str(self.retry_after)})
+            return
+
+        if random.random() < self.error_rate:
+            self._send(503, {"error": {"message": "Service unavailable", "type": "server_error"}})
+            return
+
+        prompt = request["messages"][-1]["content"]
+        content = echo_translation(prompt)
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+
+        self._send(200, {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+
+def make_server(port=8099, throttle_rate=0.0, error_rate=0.0, retry_after=1,
+                latency=0.0, rpm_limit=0):
+    handler = type("ConfiguredHandler", (FakeOpenAIHandler,), {
+        "throttle_rate": throttle_rate,
+        "error_rate": error_rate,
+        "retry_after": retry_after,
+        "latency": latency,
+        "rpm_limit": rpm_limit,
+        "window": [],
+        "lock": threading.Lock(),
+    })
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI server with throttling")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--throttle-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of requests answered with 503")
+    parser.add_argument("--retry-after", type=int, default=1,
+                        help="Retry-After seconds sent with 429s")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds added to every request")
+    parser.add_argument("--rpm-limit", type=int, default=0,
+                        help="hard requests/minute quota (0 = none)")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.throttle_rate, args.error_rate,
+                         args.retry_after, args.latency, args.rpm_limit)
+    print(f"Fake OpenAI server on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
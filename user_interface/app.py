@@ -1,13 +1,20 @@
-from flask import Flask, render_template, request, send_file
+from flask import Flask, render_template, request, send_from_directory, jsonify, Response
 import os
+import threading
 import uuid
 
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from config import settings
 from main import process_pdf
+from agents.block_translator import PROMPT_VERSION
+from agents.metrics import get_default_metrics
+from user_interface.job_queue import create_job_queue, QueueFull
+from user_interface.result_cache import ResultCache, save_and_hash, make_result_key
 
 app = Flask(__name__, template_folder="templates")
+app.config["MAX_CONTENT_LENGTH"] = settings.MAX_UPLOAD_BYTES
 
 UPLOAD_FOLDER = "user_interface/uploads"
 OUTPUT_FOLDER = "output"
@@ -15,27 +22,159 @@ OUTPUT_FOLDER = "output"
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
+# Uploads are translated in the background; the request only queues them
+jobs = create_job_queue(
+    settings.JOB_QUEUE,
+    max_concurrent_jobs=settings.MAX_CONCURRENT_JOBS,
+    max_queued_jobs=settings.MAX_QUEUED_JOBS,
+)
+
+# Finished translations by (input hash, language, pipeline version):
+# a repeat upload is answered from output/ without running the pipeline
+results = ResultCache(
+    OUTPUT_FOLDER,
+    max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+    max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+)
+in_flight = {}      # result key → job ID, so concurrent duplicates share one job
+in_flight_lock = threading.Lock()
+
+
+def pipeline_version():
+    # Everything that changes the output PDF for the same input file.
+    # Worker counts / IMAGES_IN_MEMORY only change speed and are left out,
+    # except REBUILD_WORKERS: parallel chunks embed their own font subsets.
+    model = {"local": settings.LOCAL_MODEL_NAME, "stub": "stub"}.get(
+        settings.TRANSLATION_BACKEND, settings.OPENAI_MODEL)
+    return "/".join(str(part) for part in [
+        settings.PIPELINE_VERSION, PROMPT_VERSION,
+        settings.TRANSLATION_BACKEND, model,
+        settings.TABLE_OVERLAP_THRESHOLD,
+        settings.MERGE_SEGMENTS, settings.MERGE_TOKEN_BUDGET,
+        settings.STREAMING, settings.STREAM_FLUSH_PAGES,
+        settings.REBUILD_MODE, settings.REBUILD_WORKERS, settings.REBUILD_CHUNK_SIZE,
+    ])
+
+
+def run_job(input_path, output_path, key, input_hash, progress=None):
+    try:
+        process_pdf(input_path, output_path, progress=progress, input_hash=input_hash)
+        results.put(key, os.path.basename(output_path))
+    finally:
+        with in_flight_lock:
+            in_flight.pop(key, None)
+
+
+def wants_json():
+    best = request.accept_mimetypes.best_match(["application/json", "text/html"])
+    return best == "application/json"
+
+
+def error_response(message, code):
+    if wants_json():
+        return jsonify(error=message), code
+    return render_template("index.html", error=message), code
+
+
+def accept_upload(stream):
+    # Stream the PDF to disk (hashing as it goes), then answer from the
+    # result cache or queue a translation job
+    file_id = uuid.uuid4().hex
+    input_path = os.path.join(UPLOAD_FOLDER, f"{file_id}.pdf")
+    output_file = f"{file_id}_translated.pdf"
+    output_path = os.path.join(OUTPUT_FOLDER, output_file)
+
+    metrics = get_default_metrics()
+    input_hash = save_and_hash(stream, input_path)
+    metrics.incr("bytes_written", os.path.getsize(input_path), kind="upload")
+    key = make_result_key(input_hash, settings.TARGET_LANG, pipeline_version())
+
+    cached = results.get(key)
+    metrics.incr("result_cache_lookups", result="hit" if cached else "miss")
+    if cached:
+        os.remove(input_path)
+        link = f"/download/{cached}"
+        if wants_json():
+            return jsonify(status="done", download_link=link)
+        return render_template("index.html", download_link=link)
+
+    with in_flight_lock:
+        job_id = in_flight.get(key)
+        if job_id is None:
+            try:
+                jobs.submit(file_id, output_file, run_job,
+                            input_path, output_path, key, input_hash)
+                in_flight[key] = job_id = file_id
+            except QueueFull:
+                job_id = None
+        else:
+            # Same document already in the queue → follow that job
+            os.remove(input_path)
+
+    if job_id is None:
+        os.remove(input_path)
+        metrics.incr("jobs_rejected")
+        return error_response("Too many jobs in progress, try again later.", 429)
+
+    if wants_json():
+        return jsonify(job_id=job_id, status_url=f"/status/{job_id}"), 202
+    return render_template("index.html", job_id=job_id), 202
+
+
 @app.route("/", methods=["GET", "POST"])
 def index():
     if request.method == "POST":
+        # Multipart form: werkzeug spools the file part to a temp file,
+        # never holding a large upload in memory
         file = request.files.get("pdf_file")
         if not file or file.filename == "":
-            return render_template("index.html", error="No file selected.")
-
-        file_id = uuid.uuid4().hex
-        input_path = os.path.join(UPLOAD_FOLDER, f"{file_id}.pdf")
-        output_path = os.path.join(OUTPUT_FOLDER, f"{file_id}_translated.pdf")
+            return error_response("No file selected.", 400)
 
-        file.save(input_path)
-        process_pdf(input_path, output_path)
-        
-        return render_template("index.html", download_link=f"/download/{file_id}_translated.pdf")
+        return accept_upload(file.stream)
 
     return render_template("index.html")
 
+
+@app.route("/upload", methods=["POST"])
+def upload():
+    # Raw body (Content-Type: application/pdf): copied straight from the
+    # socket to disk in chunks, no multipart parsing at all
+    if not request.content_length:
+        return error_response("Empty upload.", 400)
+    return accept_upload(request.stream)
+
+
+@app.errorhandler(413)
+def too_large(e):
+    limit = settings.MAX_UPLOAD_BYTES // (1024 * 1024)
+    return error_response(f"File too large (limit {limit} MB).", 413)
+
+
+@app.route("/status/<job_id>")
+def status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify(error="Unknown job."), 404
+
+    info = job.to_dict()
+    if info["output_file"]:
+        info["download_link"] = f"/download/{info['output_file']}"
+    return jsonify(info)
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    # Prometheus text exposition of every counter / timing in this process
+    return Response(get_default_metrics().prometheus_text(),
+                    mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/download/<filename>")
 def download(filename):
-    return send_file(os.path.join(OUTPUT_FOLDER, filename), as_attachment=True)
+    # Streamed from disk in chunks; conditional=True answers Range /
+    # If-None-Match requests (resumable downloads, 206 partial content)
+    return send_from_directory(os.path.abspath(OUTPUT_FOLDER), filename,
+                               as_attachment=True, conditional=True)
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=True, port=5000, threaded=True)
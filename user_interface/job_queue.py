@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_CONCURRENT_JOBS = 2
+MAX_QUEUED_JOBS = 50      # queued + running; more → QueueFull (HTTP 429)
+JOB_HISTORY = 500         # finished jobs kept for status lookups
+
+# Pipeline stage → progress field reported by /status
+PROGRESS_FIELDS = {
+    "extract": "pages_extracted",
+    "translate": "segments_translated",
+    "rebuild": "pages_rebuilt",
+}
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+
+    def __init__(self, job_id, output_file):
+        self.id = job_id
+        self.output_file = output_file
+        self.status = "queued"         # queued → running → done / failed
+        self.error = None
+        self.progress = {field: {"done": 0, "total": 0}
+                         for field in PROGRESS_FIELDS.values()}
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.lock = threading.Lock()
+
+    def update(self, stage, done, total):
+        # Passed to process_pdf as its progress callback
+        field = PROGRESS_FIELDS.get(stage)
+        if field is None:
+            return
+        with self.lock:
+            self.progress[field] = {"done": done, "total": total}
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "error": self.error,
+                "progress": {k: dict(v) for k, v in self.progress.items()},
+                "output_file": self.output_file if self.status == "done" else None,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+            }
+
+
+class JobQueue:
+    # Interface: submit(job_id, output_file, fn, *args) → Job, get(job_id) → Job.
+    # `fn(*args, progress=job.update)` does the actual work.
+
+    def submit(self, job_id, output_file, fn, *args):
+        raise NotImplementedError
+
+    def get(self, job_id):
+        raise NotImplementedError
+
+
+class LocalJobQueue(JobQueue):
+    # In-process stand-in for an external queue (Celery, RQ, ...): a fixed
+    # pool of worker threads runs the jobs, job state lives in memory.
+
+    def __init__(self, max_concurrent_jobs=MAX_CONCURRENT_JOBS,
+                 max_queued_jobs=MAX_QUEUED_JOBS, history=JOB_HISTORY):
+        self.max_queued_jobs = max_queued_jobs
+        self.history = history
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=max_concurrent_jobs,
+                                       thread_name_prefix="job")
+
+    def submit(self, job_id, output_file, fn, *args):
+        job = Job(job_id, output_file)
+
+        with self.lock:
+            active = sum(1 for j in self.jobs.values()
+                         if j.status in ("queued", "running"))
+            if active >= self.max_queued_jobs:
+                raise QueueFull(f"{active} jobs already queued")
+
+            self.jobs[job_id] = job
+            self._trim()
+
+        self.pool.submit(self._run, job, fn, args)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def _trim(self):
+        # Forget the oldest finished jobs beyond the history limit
+        finished = [k for k, j in self.jobs.items() if j.status in ("done", "failed")]
+        for key in finished[:max(0, len(finished) - self.history)]:
+            del self.jobs[key]
+
+    def _run(self, job, fn, args):
+        with job.lock:
+            job.status = "running"
+            job.started = time.time()
+
+        try:
+            fn(*args, progress=job.update)
+            status, error = "done", None
+        except Exception as e:
+            print(f"Job {job.id} failed:", e)
+            status, error = "failed", str(e)
+
+        with job.lock:
+            job.status = status
+            job.error = error
+            job.finished = time.time()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+
+JOB_QUEUES = {
+    "local": LocalJobQueue,
+}
+
+
+def create_job_queue(name="local", **kwargs):
+    if name not in JOB_QUEUES:
+        raise ValueError(f"Unknown job queue: {name!r} "
+                         f"(choose from {', '.join(JOB_QUEUES)})")
+    return JOB_QUEUES[name](**kwargs)
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+RESULT_CACHE_PATH = os.path.join("data", "result_cache.sqlite")
+MAX_OUTPUT_BYTES = 2 * 1024 * 1024 * 1024    # translated PDFs kept in output/
+MAX_ENTRIES = 1000
+SAVE_CHUNK = 1024 * 1024
+
+
+def save_and_hash(stream, path):
+    # Copy an upload to disk in chunks, hashing it on the way
+    digest = hashlib.sha256()
+    with open(path, "wb") as f:
+        for chunk in iter(lambda: stream.read(SAVE_CHUNK), b""):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+def make_result_key(input_hash, target_lang, pipeline_version):
+    raw = "\x1f".join([input_hash, target_lang, str(pipeline_version)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    # (input hash, language, pipeline version) → translated PDF in output/.
+    # Least recently used files are deleted once the folder passes
+    # max_bytes or max_entries.
+
+    def __init__(self, output_folder, path=RESULT_CACHE_PATH,
+                 max_bytes=MAX_OUTPUT_BYTES, max_entries=MAX_ENTRIES):
+        self.output_folder = output_folder
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                   key TEXT PRIMARY KEY,
+                   output_file TEXT NOT NULL,
+                   size INTEGER NOT NULL,
+                   last_used REAL NOT NULL
+               )"""
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_results_last_used ON results(last_used)"
+        )
+        self.conn.commit()
+
+    def get(self, key):
+        # Output file name of a cached result, or None
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT output_file FROM results WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or not os.path.isfile(os.path.join(self.output_folder, row[0])):
+                if row is not None:
+                    # File removed behind our back → forget the entry
+                    self.conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self.conn.commit()
+                self.misses += 1
+                return None
+
+            self.conn.execute(
+                "UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, output_file):
+        size = os.path.getsize(os.path.join(self.output_folder, output_file))
+
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results (key, output_file, size, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, output_file, size, time.time()),
+            )
+            self.conn.commit()
+            self._evict()
+
+    def _evict(self):
+        # Drop least recently used results (and their files) until both
+        # limits hold again, with 10% headroom on the byte limit
+        total_bytes, entries = self.conn.execute(
+            "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM results"
+        ).fetchone()
+        if total_bytes <= self.max_bytes and entries <= self.max_entries:
+            return
+
+        target = int(self.max_bytes * 0.9)
+        cursor = self.conn.execute(
+            "SELECT key, output_file, size FROM results ORDER BY last_used ASC"
+        )
+
+        doomed = []
+        for key, output_file, size in cursor:
+            if total_bytes <= target and entries <= self.max_entries:
+                break
+            doomed.append((key, output_file))
+            total_bytes -= size
+            entries -= 1
+
+        for key, output_file in doomed:
+            try:
+                os.remove(os.path.join(self.output_folder, output_file))
+            except OSError:
+                pass
+
+        self.conn.executemany("DELETE FROM results WHERE key = ?",
+                              [(key,) for key, _ in doomed])
+        self.conn.commit()
+        self.evictions += len(doomed)
+
+    def stats(self):
+        with self.lock:
+            total_bytes, entries = self.conn.execute(
+                "SELECT COALESCE(SUM(size), 0), COUNT(*) FROM results"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": total_bytes,
+        }